@@ -1,4 +1,39 @@
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+from httpclient import APIClient, TokenBucket, APIError, APIUnavailableError
+from marketdata import decode_markets, decode_market_chart
+from httpcache import ResponseCache
+from keypool import KeyPool
+from pricecache import PriceCache
+
+#on disk cache shared by every client - survives restarts
+response_cache = ResponseCache()
+
+#shared clients - one pooled session and rate limiter per provider.
+#cache policies are seconds a stored response is fresh for (0 means always revalidate)
+coingecko_client = APIClient("coingecko", "https://api.coingecko.com/api/v3",
+                             rate_limiter=TokenBucket(rate=30/60, capacity=3), #demo tier is 30 calls/min
+                             key_params=("x_cg_demo_api_key",), cache=response_cache,
+                             cache_policy={"/search": 7 * 24 * 60 * 60, "/coins/list": 24 * 60 * 60,
+                                           "/coins/markets": 0})
+freecurrency_client = APIClient("freecurrency", "https://api.freecurrencyapi.com/v1", pool_size=4,
+                                rate_limiter=TokenBucket(rate=10/60, capacity=3), #free tier is 10 calls/min
+                                key_params=("apikey",), cache=response_cache,
+                                cache_policy={"/latest": 60 * 60})
+cryptopanic_client = APIClient("cryptopanic", "https://cryptopanic.com/api/v1", pool_size=4,
+                               rate_limiter=TokenBucket(rate=1, capacity=3),
+                               key_params=("auth_token",), cache=response_cache,
+                               cache_policy={"/posts/": 2 * 60})
+
+#limits for /coins/markets requests
+MAX_IDS_PER_REQUEST = 250 #coingecko's max per_page
+MAX_IDS_LENGTH = 2000 #max characters of comma separated ids in one url
+MAX_CONCURRENT_CHUNKS = 3 #kept low to stay within the rate limit
+
+#shared by price tracker, portfolio and transactions so the same coin isn't fetched repeatedly
+price_cache = PriceCache(ttl=60, max_entries=1000)
 
 #MUTUAL FUNCTIONS
 def read_api_key(file_path):
@@ -18,15 +53,62 @@ def read_api_key(file_path):
         print(f"Error reading API key file: {e}")
         return None
 
+
+#keys are read from file once, then rotated with throttled keys skipped
+coingecko_keys = KeyPool("coingecko_API_keys.txt", read_api_key)
+freecurrency_keys = KeyPool("freecurrency_API_keys.txt", read_api_key)
+cryptopanic_keys = KeyPool("cryptopanic_API_keys.txt", read_api_key)
+
+
+def get_with_key(client, key_pool, key, path, params=None, headers=None):
+    """sends request using key, recording the outcome in the key's pool"""
+    try:
+        response = client.get(path, params=params, headers=headers)
+    except requests.RequestException:
+        key_pool.report(key)
+        raise
+    #cache hits don't use any quota, but a 304 revalidation is a real request made with the key
+    if not getattr(response, "from_cache", False) or getattr(response, "revalidated", False):
+        key_pool.report(key, response)
+    return response
+
+
+def is_coingecko_throttled():
+    """True while coingecko requests are being held back - circuit open, rate limit used up or
+    every key in cooldown. once the circuit's reset timeout has passed this is False again, so
+    the next poll can be the probe request that closes it"""
+    return (coingecko_client.circuit_breaker.is_open()
+            or coingecko_client.rate_limiter.available() < 1
+            or coingecko_keys.available_count() == 0)
+
+
+def get_client_stats():
+    """returns request latency stats for each provider"""
+    return {client.name: {**client.stats.summary(), "circuit": client.circuit_breaker.state}
+            for client in (coingecko_client, freecurrency_client, cryptopanic_client)}
+
+
+def get_cache_stats():
+    """returns hit / revalidation / miss counts for the on disk response cache"""
+    return response_cache.stats()
+
+
+def get_key_pool_stats():
+    """returns usage and cooldown state of every api key, by provider"""
+    return {
+        "coingecko": coingecko_keys.stats(),
+        "freecurrency": freecurrency_keys.stats(),
+        "cryptopanic": cryptopanic_keys.stats(),
+    }
+
 #CG API FUNCTIONS
 
 def get_PT_data(ids, api_key):
-    url = "https://api.coingecko.com/api/v3/coins/markets"
     params = {
         "vs_currency": "usd",
         "ids": ",".join(ids),
         "order": "market_cap_rank",
-        "per_page": 100,
+        "per_page": min(len(ids), MAX_IDS_PER_REQUEST),
         "page": 1,
         "sparkline": False,
         "price_change_percentage": "1h,24h,7d",
@@ -34,102 +116,262 @@ def get_PT_data(ids, api_key):
     }
     
     headers = {
-        "Accepts": "application/json",
         "X-CG-Demo-API-Key": api_key
     }
     
     try:
-        response = requests.get(url, params=params, headers=headers)
+        response = get_with_key(coingecko_client, coingecko_keys, api_key, "/coins/markets", params, headers)
         response.raise_for_status()
-        data = response.json()
-        
-        results_dict = {}
-        for coin in data:
-            results = [
-                coin['name'],
-                coin['symbol'],
-                coin['current_price'],
-                coin.get('price_change_percentage_1h_in_currency', 0),
-                coin.get('price_change_percentage_24h_in_currency', 0),
-                coin.get('price_change_percentage_7d_in_currency', 0),
-                coin['market_cap'],
-                coin['market_cap_rank']
-            ]
-            results_dict[coin['id']] = results
-            
-        return results_dict
-        
-    except requests.RequestException:
+        return decode_markets(response.content) #{coin id: (name, symbol, price, ...)} - only the fields used are kept
+
+    except (requests.RequestException, ValueError): #ValueError - body wasn't valid json
         return None
 
-def get_price_tracker_data(coins):
-    api_keys = read_api_key("coingecko_API_keys.txt")
-    for key in api_keys:
-        result = get_PT_data(coins, key)
-        if result:
-            return result
-    return {coin: {} for coin in coins}
+def chunk_ids(ids, max_count=MAX_IDS_PER_REQUEST, max_length=MAX_IDS_LENGTH):
+    """splits ids into chunks that fit in one /coins/markets request (page size and url length)"""
+    chunks = []
+    current = []
+    current_length = 0
+    for coin_id in ids:
+        extra = len(coin_id) + (1 if current else 0) #+1 for the comma
+        if current and (len(current) >= max_count or current_length + extra > max_length):
+            chunks.append(current)
+            current = []
+            extra = len(coin_id)
+            current_length = 0
+        current.append(coin_id)
+        current_length += extra
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def get_PT_chunk(ids):
+    """fetches one chunk of ids, trying each available api key in turn.
+    identical requests already in flight share the same call"""
+    def try_keys():
+        for key in coingecko_keys.keys_to_try():
+            result = get_PT_data(ids, key)
+            if result:
+                return result
+        return None
+    return coingecko_client.coalesce("/coins/markets", {"ids": ",".join(ids)}, try_keys)
+
+
+def fetch_PT_chunks(ids):
+    """fetches any number of ids, splitting them into chunks fetched concurrently.
+    returns a list of (chunk, result or None) in the same order as the chunks"""
+    def fetch_chunk(chunk):
+        try:
+            return get_PT_chunk(chunk)
+        except APIError: #e.g. circuit open - treated as a failed chunk
+            return None
+
+    chunks = chunk_ids(ids)
+    if len(chunks) == 1:
+        return [(chunks[0], fetch_chunk(chunks[0]))]
+
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_CHUNKS, len(chunks))) as executor:
+        results = executor.map(fetch_chunk, chunks)
+        return list(zip(chunks, results))
+
+
+def get_price_tracker_data(coins, max_age=None):
+    """returns {coin id: price data} - only coins not fresh in the cache are fetched.
+    max_age overrides the cache ttl (0 forces everything to be fetched).
+    if fetching fails, the last cached (stale) data is used instead"""
+    cached, missing = price_cache.get_many(coins, max_age)
+
+    fetched = {}
+    failed = []
+    if missing:
+        for chunk, result in fetch_PT_chunks(missing):
+            if result:
+                price_cache.put_many(result, chunk)
+                fetched.update(result)
+            else:
+                failed.extend(chunk)
+
+    stale = {}
+    for coin_id in failed:
+        entry = price_cache.get_entry(coin_id)
+        if entry is not None and entry.values:
+            stale[coin_id] = entry.values
+
+    if not cached and not fetched and not stale and failed:
+        return {coin: {} for coin in coins}
+
+    results = {coin_id: entry.values for coin_id, entry in cached.items() if entry.values}
+    results.update(fetched)
+    results.update({coin_id: stale.get(coin_id, {}) for coin_id in failed}) #failed with no cached data show as empty
+
+    #keeps the same order the api gives (by market cap rank)
+    def rank(item):
+        values = item[1]
+        return values[7] if values and values[7] else float('inf')
+    return dict(sorted(results.items(), key=rank))
 
 
 def get_coin_ticker(coin_name, api_key):
-    """retrieves ticker (symbol) for a given coin name using CoinGecko API"""
-    url = "https://api.coingecko.com/api/v3/search"
+    """retrieves ticker (symbol) for a given coin name using CoinGecko API, or None if no coin matches.
+    raises requests.RequestException (or ValueError for a bad response) if the request fails"""
     params = {
         "query": coin_name,
         "x_cg_demo_api_key": api_key
     }
     headers = {
-        "Accepts": "application/json",
         "X-CG-Demo-API-Key": api_key
     }
 
-    try:
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        if data['coins']:
-            return data['coins'][0]['symbol']
-        else:
-            return None
+    response = get_with_key(coingecko_client, coingecko_keys, api_key, "/search", params, headers)
+    response.raise_for_status()
+    data = response.json()
 
-    except requests.RequestException:
+    if data['coins']:
+        return data['coins'][0]['symbol']
+    else:
         return None
     
 
 def get_coin_ticker_with_key(coin_name):
-    """attempts to get coin ticker using multiple API keys"""
-    api_keys = read_api_key("coingecko_API_keys.txt")
-    for key in api_keys:
-        result = get_coin_ticker(coin_name, key)
-        if result:
-            return result
-    return None
+    """attempts to get coin ticker using multiple API keys. returns None if no coin matches,
+    raises APIUnavailableError if every key failed"""
+    def try_keys():
+        for key in coingecko_keys.keys_to_try():
+            try:
+                return get_coin_ticker(coin_name, key)
+            except (requests.RequestException, ValueError, KeyError):
+                continue
+        raise APIUnavailableError(coingecko_client.name)
+    return coingecko_client.coalesce("/search", {"query": coin_name}, try_keys)
+
+
+
+def get_market_chart(coin_id, start=None, end=None, days=365):
+    """gets price history for a coin as (timestamps, prices, volumes, market caps) numpy arrays.
+    between start and end (unix seconds) if start is given, otherwise the last days days.
+    coingecko picks the granularity - 5 minutely up to a day, hourly up to 90 days, then daily.
+    raises APIError if every key failed"""
+    if start is None:
+        path = f"/coins/{coin_id}/market_chart"
+        params = {"vs_currency": "usd", "days": days}
+    else:
+        path = f"/coins/{coin_id}/market_chart/range"
+        params = {"vs_currency": "usd", "from": int(start), "to": int(end if end is not None else time.time())}
+
+    def try_keys():
+        for key in coingecko_keys.keys_to_try():
+            headers = {"X-CG-Demo-API-Key": key}
+            try:
+                response = get_with_key(coingecko_client, coingecko_keys, key, path,
+                                        {**params, "x_cg_demo_api_key": key}, headers)
+                response.raise_for_status()
+                return decode_market_chart(response.content)
+            except (requests.RequestException, ValueError):
+                continue
+        raise APIUnavailableError(coingecko_client.name)
+    return coingecko_client.coalesce(path, params, try_keys)
+
+
+def get_coin_list():
+    """gets every coin CoinGecko supports as a list of {'id', 'symbol', 'name'}.
+    raises APIUnavailableError if every key failed"""
+    def try_keys():
+        for key in coingecko_keys.keys_to_try():
+            params = {"x_cg_demo_api_key": key}
+            headers = {"X-CG-Demo-API-Key": key}
+            try:
+                response = get_with_key(coingecko_client, coingecko_keys, key, "/coins/list", params, headers)
+                response.raise_for_status()
+                return response.json()
+            except (requests.RequestException, ValueError):
+                continue
+        raise APIUnavailableError(coingecko_client.name)
+    return coingecko_client.coalesce("/coins/list", {}, try_keys)
 
 
 #FCA API FUNCTIONS
 
 def get_exchange_rate(original_currency, new_currency):
     """gets exchange rate for a currency pair."""
-    api_url = "https://api.freecurrencyapi.com/v1/latest"
-    api_keys = read_api_key("freecurrency_API_keys.txt")
-    for key in api_keys: #validates the key to make sure it works
-        response = requests.get(f"{api_url}?apikey={key}&base_currency={original_currency}&currencies={new_currency}")
-        if response.status_code == 200:
-            return response.json()['data'][new_currency]
-    return "Error, Try again"
+    pair_params = {"base_currency": original_currency, "currencies": new_currency}
+
+    def try_keys():
+        for key in freecurrency_keys.keys_to_try(): #validates the key to make sure it works
+            params = {"apikey": key, **pair_params}
+            try:
+                response = get_with_key(freecurrency_client, freecurrency_keys, key, "/latest", params)
+            except requests.RequestException:
+                continue
+            if response.status_code == 200:
+                return response.json()['data'][new_currency]
+        raise APIUnavailableError(freecurrency_client.name)
+    return freecurrency_client.coalesce("/latest", pair_params, try_keys)
+
+
+def get_exchange_rates(base_currency):
+    """gets every exchange rate for one base currency in a single call as {currency: rate}.
+    raises APIError if every key failed"""
+    def try_keys():
+        for key in freecurrency_keys.keys_to_try():
+            params = {"apikey": key, "base_currency": base_currency}
+            try:
+                response = get_with_key(freecurrency_client, freecurrency_keys, key, "/latest", params)
+            except requests.RequestException:
+                continue
+            if response.status_code == 200:
+                return response.json()['data']
+        raise APIUnavailableError(freecurrency_client.name)
+    return freecurrency_client.coalesce("/latest", {"base_currency": base_currency}, try_keys)
 
 #NEWS API FUNCTIONS
 
 def get_news(filters = None):
-    api_url = "https://cryptopanic.com/api/v1/posts/"
-    api_keys = read_api_key("cryptopanic_API_keys.txt")
-    
-    for key in api_keys: #validates the key to make sure it works
-        response = requests.get(f"{api_url}?auth_token={key}{filters if filters else ''}")
-        if response.status_code == 200:
-            return response.json()["results"]
-    return "Error, Try again"
+    #filters are given as a query string e.g. "&page=2"
+    filter_params = parse_qsl(filters.lstrip("&?")) if filters else []
+
+    def try_keys():
+        for key in cryptopanic_keys.keys_to_try(): #validates the key to make sure it works
+            params = [("auth_token", key)] + filter_params
+            try:
+                response = get_with_key(cryptopanic_client, cryptopanic_keys, key, "/posts/", params)
+            except requests.RequestException:
+                continue
+            if response.status_code == 200:
+                return response.json()["results"]
+        raise APIUnavailableError(cryptopanic_client.name)
+    return cryptopanic_client.coalesce("/posts/", filter_params, try_keys)
+
+
+def get_news_page(page):
+    """gets one page of news. returns (formatted stories, whether there is a next page).
+    raises APIError if every key failed"""
+    params = [("page", str(page))]
+
+    def try_keys():
+        for key in cryptopanic_keys.keys_to_try():
+            try:
+                response = get_with_key(cryptopanic_client, cryptopanic_keys, key, "/posts/",
+                                        [("auth_token", key)] + params)
+            except requests.RequestException:
+                continue
+            if response.status_code == 200:
+                data = response.json()
+                return [format_news_item(item) for item in data["results"]], bool(data.get("next"))
+            if response.status_code == 404: #past the last page
+                return [], False
+        raise APIUnavailableError(cryptopanic_client.name)
+    return cryptopanic_client.coalesce("/posts/", params, try_keys)
+
+
+def format_news_item(item):
+    return {
+        'id': item['id'],
+        'title': item['title'],
+        'url': item['url'],
+        'ticker': extract_ticker(item),
+        'published_at': item['published_at'].rstrip("Z").replace("T", " / ")
+    }
 
 
 def get_formatted_news(filters=None):
@@ -138,13 +380,7 @@ def get_formatted_news(filters=None):
     #processes and returns data
     processed_data = []
     for item in data:
-        processed_item = {
-            'title': item['title'],
-            'url': item['url'],
-            'ticker': extract_ticker(item),
-            'published_at': item['published_at'].rstrip("Z").replace("T", " / ")
-        }
-        processed_data.append(processed_item)
+        processed_data.append(format_news_item(item))
     return processed_data
 
 
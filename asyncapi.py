@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import apifunctions
+
+#the async functions drive the same pooled, rate limited clients as apifunctions,
+#so key rotation, rate limits and request coalescing still apply
+MAX_CONCURRENT_REQUESTS = 6
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="asyncapi")
+
+
+async def run_blocking(func, *args, semaphore=None, **kwargs):
+    """runs a blocking api function without blocking the event loop.
+    semaphore (if given) bounds how many run at once"""
+    loop = asyncio.get_running_loop()
+    call = partial(func, *args, **kwargs)
+    if semaphore is None:
+        return await loop.run_in_executor(executor, call)
+    async with semaphore:
+        return await loop.run_in_executor(executor, call)
+
+
+#CG API FUNCTIONS
+
+async def get_PT_data(ids, api_key, semaphore=None):
+    return await run_blocking(apifunctions.get_PT_data, ids, api_key, semaphore=semaphore)
+
+
+async def get_price_tracker_data(coins, max_age=None, semaphore=None):
+    return await run_blocking(apifunctions.get_price_tracker_data, coins, max_age, semaphore=semaphore)
+
+
+async def get_coin_ticker(coin_name, api_key, semaphore=None):
+    return await run_blocking(apifunctions.get_coin_ticker, coin_name, api_key, semaphore=semaphore)
+
+
+async def get_coin_ticker_with_key(coin_name, semaphore=None):
+    return await run_blocking(apifunctions.get_coin_ticker_with_key, coin_name, semaphore=semaphore)
+
+
+async def get_market_chart(coin_id, start=None, end=None, days=365, semaphore=None):
+    return await run_blocking(apifunctions.get_market_chart, coin_id, start, end, days, semaphore=semaphore)
+
+
+#FCA API FUNCTIONS
+
+async def get_exchange_rate(original_currency, new_currency, semaphore=None):
+    return await run_blocking(apifunctions.get_exchange_rate, original_currency, new_currency, semaphore=semaphore)
+
+
+#NEWS API FUNCTIONS
+
+async def get_news(filters=None, semaphore=None):
+    return await run_blocking(apifunctions.get_news, filters, semaphore=semaphore)
+
+
+async def get_formatted_news(filters=None, semaphore=None):
+    return await run_blocking(apifunctions.get_formatted_news, filters, semaphore=semaphore)
+
+
+async def get_news_page(page, semaphore=None):
+    return await run_blocking(apifunctions.get_news_page, page, semaphore=semaphore)
+
+
+#BATCH FUNCTIONS
+
+async def gather_calls(calls, max_concurrency=MAX_CONCURRENT_REQUESTS):
+    """runs independent calls in parallel. calls is {name: (async function, *args)}.
+    returns {name: result}, where a call that failed has its exception as the result"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    names = list(calls)
+    coroutines = [func(*args, semaphore=semaphore) for func, *args in calls.values()]
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    return dict(zip(names, results))
+
+
+def fetch_batch(calls, max_concurrency=MAX_CONCURRENT_REQUESTS):
+    """blocking entry point for gather_calls - e.g. for use from a background task.
+    total time is that of the slowest call rather than the sum of them all"""
+    return asyncio.run(gather_calls(calls, max_concurrency))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,110 @@
+from notestorage import content_hash
+
+AUTOSAVE_DELAY = 1500 #ms after the last edit before a note is saved
+
+
+class NoteAutosaver:
+    """saves notes in the background while they are edited. edits are debounced - a note is
+    saved once typing pauses - and a save is skipped if the note's hash matches the last one
+    saved, so moving the cursor or reselecting a note writes nothing.
+    all methods run on the tk main thread - saving is done through the app's TaskRunner"""
+    def __init__(self, root, tasks, save, delay=AUTOSAVE_DELAY):
+        self.root = root
+        self.tasks = tasks
+        self.save = save #save(note id, content) - blocking, returns True if it was saved
+        self.delay = delay
+        self.__saved = {} #note id -> hash of the content last saved (or loaded)
+        self.__pending = None #(note id, function returning its content) waiting for typing to pause
+        self.__after_id = None
+        self.__saving = {} #note id -> (Task, content) of the save in progress
+        self.__queued = {} #note id -> content to save once its current save finishes
+        self.saves = 0
+        self.skipped = 0
+
+    def track(self, note_id, content):
+        """records content as the saved version of a note (e.g. just loaded or saved by hand)"""
+        self.__saved[note_id] = content_hash(content)
+
+    def forget(self, note_id):
+        """drops a deleted note, including an edit waiting to be saved"""
+        self.__saved.pop(note_id, None)
+        if self.__pending and self.__pending[0] == note_id:
+            self.__cancel()
+
+    def changed(self, note_id, get_content):
+        """called on every edit - (re)starts the wait before saving. get_content is only
+        called when the save happens, so an edit costs nothing more than rescheduling"""
+        if self.__pending and self.__pending[0] != note_id:
+            self.flush() #another note was being edited - save it now
+        self.__pending = (note_id, get_content)
+        if self.__after_id is not None:
+            self.root.after_cancel(self.__after_id)
+        self.__after_id = self.root.after(self.delay, self.flush)
+
+    def __cancel(self):
+        if self.__after_id is not None:
+            self.root.after_cancel(self.__after_id)
+            self.__after_id = None
+        self.__pending = None
+
+    def flush(self):
+        """saves the note waiting to be saved now, in the background"""
+        pending = self.__pending
+        self.__cancel()
+        if pending:
+            note_id, get_content = pending
+            self.__save(note_id, get_content())
+
+    def __save(self, note_id, content):
+        digest = content_hash(content)
+        if self.__saved.get(note_id) == digest:
+            self.skipped += 1
+            return
+        if note_id in self.__saving:
+            #one save per note at a time, so an older version can never be written last
+            self.__queued[note_id] = content
+            return
+        task = self.tasks.submit(self, self.save, note_id, content,
+                                 on_success=lambda saved: self.__on_saved(note_id, digest, saved),
+                                 on_error=lambda error: self.__on_saved(note_id, digest, False, error))
+        self.__saving[note_id] = (task, content)
+
+    def __on_saved(self, note_id, digest, saved, error=None):
+        self.__saving.pop(note_id, None)
+        queued = self.__queued.pop(note_id, None)
+        if saved:
+            self.saves += 1
+            self.__saved[note_id] = digest
+        elif error is not None:
+            print(f"Autosave failed: {error}")
+        if queued is not None:
+            self.__save(note_id, queued)
+
+    def save_now(self):
+        """saves every unsaved edit before returning - for when the page is closed (background
+        tasks may not get to run after that), or something needs to read the saved note"""
+        pending = self.__pending
+        self.__cancel()
+        unsaved = {}
+        #background saves are stopped if they haven't started (or waited for if they have), then
+        #saved again here - the app's tasks may have been cancelled, and their callbacks won't run
+        for note_id, (task, content) in self.__saving.items():
+            if not task.future.cancel():
+                task.future.exception()
+            unsaved[note_id] = content
+        unsaved.update(self.__queued)
+        if pending:
+            unsaved[pending[0]] = pending[1]()
+        self.__saving, self.__queued = {}, {}
+        for note_id, content in unsaved.items():
+            digest = content_hash(content)
+            if self.__saved.get(note_id) != digest and self.save(note_id, content):
+                self.saves += 1
+                self.__saved[note_id] = digest
+
+    def stats(self):
+        return {"saves": self.saves, "skipped": self.skipped}
+
+
+if __name__ == "__main__":
+    pass
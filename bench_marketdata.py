@@ -0,0 +1,66 @@
+#benchmarks marketdata.decode_markets against the decoding it replaced - run python bench_marketdata.py
+import json
+import timeit
+import tracemalloc
+from marketdata import decode_markets, JSON_BACKEND
+
+
+def sample_markets_payload(count=250):
+    """a /coins/markets style body with every field coingecko returns, for benchmarking"""
+    coins = []
+    for i in range(count):
+        coins.append({
+            "id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}",
+            "image": f"https://coin-images.coingecko.com/coins/images/{i}/large/coin-{i}.png",
+            "current_price": 1000.0 / (i + 1), "market_cap": 10 ** 12 // (i + 1), "market_cap_rank": i + 1,
+            "fully_diluted_valuation": 10 ** 12 // (i + 1), "total_volume": 10 ** 10 // (i + 1),
+            "high_24h": 1010.0 / (i + 1), "low_24h": 990.0 / (i + 1),
+            "price_change_24h": 1.2345, "price_change_percentage_24h": 0.5432,
+            "market_cap_change_24h": 123456789.0, "market_cap_change_percentage_24h": 0.4321,
+            "circulating_supply": 19_000_000.0 + i, "total_supply": 21_000_000.0, "max_supply": 21_000_000.0,
+            "ath": 2000.0 / (i + 1), "ath_change_percentage": -25.5, "ath_date": "2024-03-14T07:10:36.635Z",
+            "atl": 0.05, "atl_change_percentage": 12345.6, "atl_date": "2013-07-06T00:00:00.000Z",
+            "roi": {"times": 12.3, "currency": "usd", "percentage": 1230.4} if i % 3 == 0 else None,
+            "last_updated": "2025-01-01T12:00:00.000Z",
+            "price_change_percentage_1h_in_currency": 0.1234,
+            "price_change_percentage_24h_in_currency": 0.5432,
+            "price_change_percentage_7d_in_currency": -2.345,
+        })
+    return json.dumps(coins).encode()
+
+
+def decode_markets_old(content):
+    """the previous decoding - full stdlib parse of the text, then a list per coin"""
+    results_dict = {}
+    for coin in json.loads(content.decode("utf-8")):
+        results_dict[coin['id']] = [
+            coin['name'],
+            coin['symbol'],
+            coin['current_price'],
+            coin.get('price_change_percentage_1h_in_currency', 0),
+            coin.get('price_change_percentage_24h_in_currency', 0),
+            coin.get('price_change_percentage_7d_in_currency', 0),
+            coin['market_cap'],
+            coin['market_cap_rank']
+        ]
+    return results_dict
+
+
+def benchmark(count=250, runs=200):
+    """prints parse time, peak memory while parsing and memory kept afterwards, old vs new.
+    run with and without orjson installed to see what the backend is worth"""
+
+    content = sample_markets_payload(count)
+    print(f"{count} coins, {len(content) / 1024:.0f} KiB payload, backend: {JSON_BACKEND}")
+    for label, func in (("old (json + lists)", decode_markets_old), ("new (tuples)", decode_markets)):
+        seconds = min(timeit.repeat(lambda: func(content), number=runs, repeat=3)) / runs
+        tracemalloc.start()
+        result = func(content)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        print(f"{label:<20} {seconds * 1000:7.3f} ms   peak {peak / 1024:7.1f} KiB   kept {retained / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    benchmark()
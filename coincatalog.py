@@ -0,0 +1,176 @@
+import sqlite3
+import threading
+import time
+from apifunctions import get_coin_list, get_coin_ticker_with_key
+from httpclient import APIError
+from database import db
+
+SYNC_INTERVAL = 24 * 60 * 60 #seconds between syncs with coingecko's coin list
+sync_lock = threading.Lock() #only one thread syncs at a time
+
+
+def get_last_sync():
+    """returns unix time the catalog was last synced (0 if never)"""
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT syncedAt FROM SyncState WHERE name = 'CoinCatalog';")
+        result = cursor.fetchone()
+        return result[0] if result else 0
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return 0
+
+
+def sync_catalog(force=False):
+    """syncs the local catalog with coingecko's coin list (one request), only writing rows that
+    were added, changed or removed. skipped if synced within SYNC_INTERVAL unless forced.
+    returns (added, updated, removed) counts, or None if nothing was synced"""
+    with sync_lock:
+        if not force and time.time() - get_last_sync() < SYNC_INTERVAL:
+            return None
+
+        try:
+            coins = get_coin_list()
+        except APIError as e: #provider down - the existing catalog is still used
+            print(f"Unable to sync coin catalog: {e}")
+            return None
+        if not coins:
+            return None
+        latest = {coin['id']: (coin['symbol'].lower(), coin['name'])
+                  for coin in coins if coin.get('id') and coin.get('symbol') and coin.get('name')}
+
+        def apply_diff(cursor):
+            cursor.execute("SELECT coinId, symbol, name FROM CoinCatalog;")
+            existing = {coin_id: (symbol, name) for coin_id, symbol, name in cursor.fetchall()}
+
+            added = [(coin_id, symbol, name, name.lower()) for coin_id, (symbol, name) in latest.items()
+                     if coin_id not in existing]
+            updated = [(symbol, name, name.lower(), coin_id) for coin_id, (symbol, name) in latest.items()
+                       if coin_id in existing and existing[coin_id] != (symbol, name)]
+            removed = [(coin_id,) for coin_id in existing if coin_id not in latest]
+
+            cursor.executemany("INSERT INTO CoinCatalog (coinId, symbol, name, searchName) VALUES (?, ?, ?, ?);", added)
+            cursor.executemany("UPDATE CoinCatalog SET symbol = ?, name = ?, searchName = ? WHERE coinId = ?;", updated)
+            cursor.executemany("DELETE FROM CoinCatalog WHERE coinId = ?;", removed)
+            cursor.execute("INSERT OR REPLACE INTO SyncState (name, syncedAt) VALUES ('CoinCatalog', ?);",
+                           (int(time.time()),))
+            return len(added), len(updated), len(removed)
+
+        try:
+            return db.write(apply_diff).result()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+
+
+def find_coin(query):
+    """returns (coinId, symbol, name) for a coin matching query exactly by id, name or symbol, or None.
+    a symbol shared by more than one coin doesn't count as a match"""
+    query = query.strip().lower()
+    if not query:
+        return None
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT coinId, symbol, name FROM CoinCatalog WHERE coinId = ?;", (query,))
+        result = cursor.fetchone()
+        if result:
+            return result
+
+        #prefers the coin whose id matches the name (e.g. "bitcoin cash" -> bitcoin-cash)
+        cursor.execute("""
+            SELECT coinId, symbol, name FROM CoinCatalog
+            WHERE searchName = ?
+            ORDER BY coinId = ? DESC
+            LIMIT 1;
+        """, (query, query.replace(" ", "-")))
+        result = cursor.fetchone()
+        if result:
+            return result
+
+        cursor.execute("SELECT coinId, symbol, name FROM CoinCatalog WHERE symbol = ? LIMIT 2;", (query,))
+        results = cursor.fetchall()
+        return results[0] if len(results) == 1 else None
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+
+def search_coins(prefix, limit=10):
+    """returns up to limit (coinId, symbol, name) whose name or symbol starts with prefix"""
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+    upper_bound = prefix + "\uffff" #range query so the indexes can be used
+    try:
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT coinId, symbol, name FROM CoinCatalog WHERE searchName >= ? AND searchName < ?
+            UNION
+            SELECT coinId, symbol, name FROM CoinCatalog WHERE symbol >= ? AND symbol < ?
+            LIMIT ?;
+        """, (prefix, upper_bound, prefix, upper_bound, limit))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+
+
+def get_coin_ticker(coin_name):
+    """returns the ticker (upper case symbol) for a coin name or id. resolved from the local
+    catalog - the api is only used to sync the catalog or if the coin isn't found locally.
+    returns None if there is no such coin, raises APIError if the api is needed but unavailable"""
+    sync_catalog() #does nothing unless the catalog is out of date
+    coin = find_coin(coin_name)
+    if coin:
+        return coin[1].upper()
+    return get_coin_ticker_with_key(coin_name)
+
+
+def get_coin_id(ticker, hint=None):
+    """returns the coingecko id for a ticker, or None. if several coins share the ticker,
+    hint (a name or id) picks between them"""
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT coinId, searchName FROM CoinCatalog WHERE symbol = ?;", (ticker.lower(),))
+        results = cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+    if len(results) == 1:
+        return results[0][0]
+    if hint:
+        hint = hint.lower()
+        for coin_id, search_name in results:
+            if hint in (coin_id, search_name):
+                return coin_id
+    return None
+
+
+def resolve_symbols(symbols):
+    """returns {symbol: coingecko id} for many tickers in one query (tickers not in the catalog are left out).
+    if several coins share a symbol the shortest id is picked - the original coin rather than a
+    bridged or wrapped copy (e.g. ethereum rather than ethereum-wormhole)"""
+    symbols = list({symbol.lower() for symbol in symbols})
+    if not symbols:
+        return {}
+    sync_catalog() #does nothing unless the catalog is out of date
+    resolved = {}
+    try:
+        cursor = db.cursor()
+        for start in range(0, len(symbols), 500): #stays under sqlite's limit on ? parameters
+            batch = symbols[start:start + 500]
+            cursor.execute(f"""
+                SELECT symbol, coinId FROM CoinCatalog
+                WHERE symbol IN ({", ".join("?" * len(batch))})
+                ORDER BY length(coinId) DESC, coinId DESC;
+            """, batch)
+            for symbol, coin_id in cursor.fetchall():
+                resolved[symbol] = coin_id #shortest id is last, so it wins
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    return resolved
+
+
+if __name__ == "__main__":
+    pass
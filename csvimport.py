@@ -0,0 +1,430 @@
+import csv
+import hashlib
+import io
+from datetime import datetime, timezone
+import os
+import re
+import sqlite3
+from coincatalog import resolve_symbols
+from database import db
+from ratecache import rate_cache
+
+CHUNK_SIZE = 5000 #rows parsed, resolved and inserted per transaction - bounds memory use
+HEADER_SEARCH_LINES = 20 #some exports (e.g. coinbase) have a few lines of text before the header
+QUANTITY_TOLERANCE = 1e-8 #a sell may be this much more than the holding (rounding in the export)
+
+NUMBER_PATTERN = re.compile(r"[-+]?(?:\d[\d,]*)?\.?\d+(?:[eE][-+]?\d+)?")
+KRAKEN_ASSETS = {"XBT": "BTC", "XDG": "DOGE"}
+#currencies kraken pairs are quoted in, old style codes first so XETHZUSD is split at ZUSD, not USD
+KRAKEN_QUOTES = ("ZUSD", "ZEUR", "ZGBP", "ZCAD", "ZJPY", "ZCHF", "ZAUD", "XXBT", "XETH",
+                 "USDT", "USDC", "USD", "EUR", "GBP", "CAD", "JPY", "CHF", "AUD", "XBT", "ETH", "DAI")
+#transaction values are stored in USD. these quotes are taken as USD, other fiat currencies are
+#converted - rows priced in anything else (e.g. BTC) are skipped
+USD_QUOTES = {"USD", "USDT", "USDC", "BUSD", "FDUSD", "TUSD", "DAI"}
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP"}
+
+
+class CSVImportError(Exception):
+    """raised when a file can't be imported at all (e.g. its format isn't recognised)"""
+
+
+def parse_number(text):
+    """returns the first number in text ("$1,234.50", "0.5BTC", "-12") as a float, or None"""
+    match = NUMBER_PATTERN.search(text or "")
+    return float(match.group().replace(",", "")) if match else None
+
+
+def symbol_currency(text):
+    """the currency of an amount written with its symbol ("€1,234.50"), or None"""
+    return next((currency for symbol, currency in CURRENCY_SYMBOLS.items() if symbol in (text or "")), None)
+
+
+def parse_time(text):
+    """returns the unix time of a timestamp in an export ("2024-01-05 13:45:00 UTC",
+    "2024-01-05T13:45:00Z", or seconds/milliseconds since 1970), or None. times without
+    a timezone are taken as UTC, which is what the exchanges export"""
+    text = (text or "").strip()
+    if not text:
+        return None
+    try:
+        number = float(text)
+        return int(number / 1000 if number > 1e11 else number)
+    except ValueError:
+        pass
+    text = text.replace(" UTC", "").replace("Z", "+00:00")
+    try:
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def signed(side, value, quantity):
+    """buys are positive and sells negative, the same as transactions added in the app"""
+    return (-abs(value), -abs(quantity)) if side == "sell" else (abs(value), abs(quantity))
+
+
+def get_side(text):
+    text = (text or "").strip().lower()
+    if "sell" in text:
+        return "sell"
+    if "buy" in text: #also e.g. "Advanced Trade Buy"
+        return "buy"
+    return None #deposits, withdrawals, rewards etc. aren't trades
+
+
+#each parser takes one row as {header: value} and returns (ticker, value, quantity, executed at, quote),
+#or None to skip it. value is in the quote currency. executed at is None if the row has no time
+
+def parse_coinbase(row):
+    side = get_side(row["Transaction Type"])
+    quantity = parse_number(row["Quantity Transacted"])
+    if side is None or not quantity:
+        return None
+    value_text = row.get("Subtotal")
+    value = parse_number(value_text)
+    if value is None:
+        value_text = row.get("Spot Price at Transaction") or row.get("Price at Transaction")
+        price = parse_number(value_text)
+        value = quantity * price if price else None
+    if value is None:
+        return None
+    #subtotal and spot price are in the account's currency, which isn't always USD
+    quote = (row.get("Spot Price Currency") or row.get("Price Currency") or "").strip().upper()
+    quote = quote or symbol_currency(value_text) or "USD"
+    return (row["Asset"].strip().upper(), *signed(side, value, quantity), parse_time(row.get("Timestamp")), quote)
+
+
+def split_amount(text, pair, base=True):
+    """splits a binance amount ("0.5BTC") into (number, asset), or (None, "") if it has no number.
+    the asset is matched against the start of the pair (base) or its end (quote), because the
+    number can't say where it stops - "100.51INCH" is 100.5 1INCH"""
+    text = (text or "").strip().upper()
+    for start in range(1, len(text)):
+        asset = text[start:]
+        if pair.startswith(asset) if base else pair.endswith(asset):
+            number = parse_number(text[:start])
+            if number is not None:
+                return number, asset
+    match = NUMBER_PATTERN.match(text)
+    if not match:
+        return None, ""
+    return float(match.group().replace(",", "")), text[match.end():].strip()
+
+
+def parse_binance(row):
+    side = get_side(row["Side"])
+    pair = row["Pair"].strip().upper()
+    quantity, ticker = split_amount(row["Executed"], pair)
+    value, quote = split_amount(row["Amount"], pair, base=False)
+    if side is None or not quantity or value is None or not ticker:
+        return None
+    #amounts are usually written with their asset, e.g. "0.025BTC" for a trade on ETHBTC
+    if not quote and pair.startswith(ticker):
+        quote = pair[len(ticker):]
+    if not quote:
+        return None
+    return (ticker, *signed(side, value, quantity), parse_time(row.get("Date(UTC)") or row.get("Time")), quote)
+
+
+def kraken_asset(code):
+    if len(code) == 4 and code[0] in "XZ": #old style codes, e.g. XXBT or ZUSD
+        code = code[1:]
+    return KRAKEN_ASSETS.get(code, code)
+
+
+def kraken_pair(pair):
+    """returns (base, quote) of a kraken pair ("XETHXXBT", "ETH/USD"), quote None if it isn't known"""
+    pair = pair.strip().upper()
+    if "/" in pair:
+        base, quote = pair.split("/", 1)
+    else:
+        quote = next((quote for quote in KRAKEN_QUOTES if pair.endswith(quote) and len(pair) > len(quote)), "")
+        base = pair[:len(pair) - len(quote)]
+    return kraken_asset(base), kraken_asset(quote) if quote else None
+
+
+def parse_kraken(row):
+    side = get_side(row["type"])
+    quantity = parse_number(row["vol"])
+    value = parse_number(row["cost"])
+    ticker, quote = kraken_pair(row["pair"])
+    if side is None or not quantity or value is None or quote is None:
+        return None
+    return (ticker, *signed(side, value, quantity), parse_time(row.get("time")), quote)
+
+
+def parse_generic(row):
+    ticker = (row.get("ticker") or row.get("asset") or row.get("coin") or row.get("symbol") or "").strip().upper()
+    quantity = parse_number(row.get("quantity") or row.get("amount"))
+    value = parse_number(row.get("value") or row.get("total"))
+    if not ticker or not quantity or value is None:
+        return None
+    executed_at = parse_time(row.get("timestamp") or row.get("date") or row.get("time"))
+    quote = (row.get("currency") or "USD").strip().upper()
+    side_text = row.get("side") or row.get("type")
+    if side_text is None: #no side column - signs in the file are used as they are
+        return ticker, value, quantity, executed_at, quote
+    side = get_side(side_text)
+    if side is None:
+        return None
+    return (ticker, *signed(side, value, quantity), executed_at, quote)
+
+
+#(name, headers that identify the format, parser, whether headers are matched case insensitively,
+#column with the exchange's trade id if the format has one)
+FORMATS = [
+    ("Coinbase", {"Transaction Type", "Asset", "Quantity Transacted"}, parse_coinbase, False, "ID"),
+    ("Binance", {"Pair", "Side", "Executed", "Amount"}, parse_binance, False, None),
+    ("Kraken", {"pair", "type", "vol", "cost"}, parse_kraken, False, "txid"),
+    ("Generic", {"quantity"}, parse_generic, True, "id"),
+]
+
+
+def detect_format(header):
+    """returns (name, parser, header, trade id column) for a header row, or None if no format matches"""
+    names = {column.strip() for column in header}
+    lower_names = {name.lower() for name in names}
+    for name, required, parser, case_insensitive, id_column in FORMATS:
+        if case_insensitive:
+            if required <= lower_names:
+                return name, parser, [column.strip().lower() for column in header], id_column
+        elif required <= names:
+            return name, parser, [column.strip() for column in header], id_column
+    return None
+
+
+class ImportResult:
+    def __init__(self, file_format):
+        self.file_format = file_format
+        self.imported = 0
+        self.duplicates = 0 #rows already imported from an earlier file
+        self.skipped = 0 #rows that aren't trades or couldn't be parsed
+        self.unresolved = set() #tickers not found in the coin catalog (their rows are skipped)
+        self.converted = {} #fiat currency -> rows converted from it to USD
+        self.unpriced = {} #quote currency -> rows skipped because their value couldn't be put in USD
+        self.oversold = {} #ticker -> sells skipped because they were more than the holding
+
+    def summary(self):
+        text = f"{self.file_format} export: {self.imported} transactions imported, {self.skipped} rows skipped"
+        if self.duplicates:
+            text += f"\nAlready imported: {self.duplicates}"
+        if self.unresolved:
+            text += f"\nUnknown coins: {', '.join(sorted(self.unresolved)[:20])}"
+        if self.converted:
+            text += (f"\nConverted to USD at current exchange rates: "
+                     f"{', '.join(f'{quote} ({count})' for quote, count in sorted(self.converted.items()))}")
+        if self.unpriced:
+            text += (f"\nSkipped - priced in a currency that can't be converted to USD: "
+                     f"{', '.join(f'{quote} ({count})' for quote, count in sorted(self.unpriced.items())[:20])}")
+        if self.oversold:
+            text += (f"\nSkipped - sells would have left a negative balance: "
+                     f"{', '.join(f'{ticker} ({count})' for ticker, count in sorted(self.oversold.items())[:20])}")
+        return text
+
+
+class TransactionImporter:
+    """streams a csv export into the Transactions table. rows are read, resolved and inserted
+    CHUNK_SIZE at a time, so memory use doesn't grow with the file. each chunk is one write
+    (savepoint), so an interrupted import keeps whole chunks only.
+    every row is stored with a fingerprint (the exchange's trade id, or a hash of the row), so a
+    file imported again only adds the rows that weren't imported before. like adding a transaction
+    in the app, a sell can't take a holding below zero - sells that would are held back until the
+    rest of the file is in (exports are often newest first), then skipped if they still would"""
+    def __init__(self, username, chunk_size=CHUNK_SIZE, progress=None):
+        self.username = username
+        self.chunk_size = chunk_size
+        self.progress = progress #called with fraction of the file done (0 to 1) - from the worker thread
+        self.__tickers = {} #ticker -> True if it can be imported (known coin), False if not
+        self.__rates = {} #quote currency -> its value in USD, None if it can't be converted
+        self.__holdings = {} #ticker -> quantity held, including what has been imported so far
+        self.__held_sells = [] #sells more than the holding when reached, retried at the end
+        self.__repeats = {} #row hash -> times seen, among rows with the same time as the last one
+        self.__repeats_time = None
+
+    def import_file(self, path):
+        """blocking - call from a background task. returns an ImportResult.
+        raises CSVImportError if the file's format isn't recognised"""
+        total_bytes = os.path.getsize(path) or 1
+        with open(path, "rb") as raw:
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            reader = csv.reader(text)
+            detected = None
+            for _ in range(HEADER_SEARCH_LINES):
+                header = next(reader, None)
+                if header is None:
+                    break
+                detected = detect_format(header)
+                if detected:
+                    break
+            if not detected:
+                raise CSVImportError("Unrecognised file - expected a Coinbase, Binance or Kraken export, "
+                                     "or a csv with ticker, quantity and value columns")
+
+            name, parser, columns, id_column = detected
+            result = ImportResult(name)
+            chunk = []
+            for row in reader:
+                if not row:
+                    continue
+                fields = dict(zip(columns, row))
+                try:
+                    parsed = parser(fields)
+                except (KeyError, ValueError, TypeError, AttributeError):
+                    parsed = None
+                if parsed is None:
+                    result.skipped += 1
+                    continue
+                trade_id = (fields.get(id_column) or "").strip() if id_column else ""
+                chunk.append((*parsed, self.__fingerprint(name, trade_id, row, parsed[3])))
+                if len(chunk) >= self.chunk_size:
+                    self.__insert_chunk(chunk, result)
+                    chunk = []
+                    self.__report(raw.tell() / total_bytes)
+            if chunk:
+                self.__insert_chunk(chunk, result)
+        self.__insert_held_sells(result)
+        self.__report(1.0)
+        return result
+
+    def __fingerprint(self, file_format, trade_id, row, executed_at):
+        """identifies a row across imports - by trade id, or by a hash of the whole row. rows that
+        are exactly the same (e.g. fills in the same second) are told apart by how many came before,
+        counted among rows with the same time - exports are in time order, so they are together"""
+        if trade_id:
+            return f"{file_format}:{trade_id}"
+        digest = hashlib.blake2b("\x1f".join(row).encode("utf-8"), digest_size=12).hexdigest()
+        if executed_at != self.__repeats_time:
+            self.__repeats, self.__repeats_time = {}, executed_at
+        count = self.__repeats.get(digest, 0)
+        self.__repeats[digest] = count + 1
+        return f"{file_format}:{digest}:{count}"
+
+    def __report(self, fraction):
+        if self.progress:
+            self.progress(min(fraction, 1.0))
+
+    def __resolve(self, tickers):
+        """makes sure every new ticker in a chunk has a Coin row. all the chunk's unknown tickers are
+        looked up in the catalog with one query (after the first chunks, most are already known)"""
+        new = {ticker for ticker in tickers if ticker not in self.__tickers}
+        if not new:
+            return
+        cursor = db.cursor()
+        cursor.execute(f"SELECT coinTicker FROM Coin WHERE coinTicker IN ({', '.join('?' * len(new))})",
+                       list(new))
+        existing = {row[0] for row in cursor.fetchall()}
+        self.__tickers.update({ticker: True for ticker in existing})
+        missing = new - existing
+        if not missing:
+            return
+        coin_ids = resolve_symbols(missing)
+        found = [(ticker, coin_ids[ticker.lower()]) for ticker in missing if ticker.lower() in coin_ids]
+        #coin name is the coingecko id, the same as transactions added in the app
+        db.write(lambda cursor: cursor.executemany(
+            "INSERT OR IGNORE INTO Coin (coinTicker, coinName) VALUES (?, ?)", found)).result()
+        self.__tickers.update({ticker: ticker.lower() in coin_ids for ticker in missing})
+
+    def __usd_rate(self, quote):
+        """what 1 quote is worth in USD, or None. other fiat currencies are converted at the rate
+        cache's current rates (loaded on the first one) - crypto quotes have no rate there"""
+        if quote not in self.__rates:
+            if quote in USD_QUOTES:
+                self.__rates[quote] = 1.0
+            else:
+                matrix = rate_cache.load()
+                self.__rates[quote] = matrix.cross_rate(quote, "USD") if matrix else None
+        return self.__rates[quote]
+
+    def __imported_ids(self, fingerprints):
+        """the fingerprints of rows already in the user's transactions"""
+        cursor = db.cursor()
+        cursor.execute(f"""
+            SELECT importId FROM Transactions
+            WHERE portfolioOwner = ? AND importId IN ({', '.join('?' * len(fingerprints))})
+        """, [self.username, *fingerprints])
+        return {row[0] for row in cursor.fetchall()}
+
+    def __load_holdings(self, tickers):
+        new = [ticker for ticker in tickers if ticker not in self.__holdings]
+        if not new:
+            return
+        cursor = db.cursor()
+        cursor.execute(f"""
+            SELECT coinTicker, quantity FROM Positions
+            WHERE positionOwner = ? AND coinTicker IN ({', '.join('?' * len(new))})
+        """, [self.username, *new])
+        self.__holdings.update({ticker: 0.0 for ticker in new})
+        self.__holdings.update(cursor.fetchall())
+
+    def __take(self, ticker, quantity):
+        """adds a transaction's quantity to the holding, unless it's a sell of more than is held"""
+        if quantity < 0 and -quantity > self.__holdings[ticker] + QUANTITY_TOLERANCE:
+            return False
+        self.__holdings[ticker] += quantity
+        return True
+
+    def __insert_chunk(self, chunk, result):
+        priced = []
+        for ticker, value, quantity, executed_at, quote, fingerprint in chunk:
+            rate = self.__usd_rate(quote)
+            if rate is None:
+                result.unpriced[quote] = result.unpriced.get(quote, 0) + 1
+                result.skipped += 1
+                continue
+            if quote not in USD_QUOTES:
+                result.converted[quote] = result.converted.get(quote, 0) + 1
+            priced.append((self.username, ticker, round(value * rate, 2), quantity, executed_at, fingerprint))
+        self.__resolve({row[1] for row in priced})
+        imported_ids = self.__imported_ids([row[5] for row in priced]) if priced else set()
+        self.__load_holdings({row[1] for row in priced})
+        rows = []
+        for row in priced:
+            ticker, quantity, fingerprint = row[1], row[3], row[5]
+            if not self.__tickers[ticker]:
+                result.unresolved.add(ticker)
+                result.skipped += 1
+            elif fingerprint in imported_ids:
+                result.duplicates += 1
+            elif self.__take(ticker, quantity):
+                rows.append(row)
+            else:
+                self.__held_sells.append(row)
+        self.__insert(rows, result)
+
+    def __insert_held_sells(self, result):
+        """inserts the sells held back that the holding now covers, skips the rest"""
+        rows = []
+        for row in self.__held_sells:
+            if self.__take(row[1], row[3]):
+                rows.append(row)
+            else:
+                result.oversold[row[1]] = result.oversold.get(row[1], 0) + 1
+                result.skipped += 1
+        self.__held_sells = []
+        self.__insert(rows, result)
+
+    def __insert(self, rows, result):
+        #OR IGNORE - a row imported since its fingerprint was checked (e.g. the same file twice at once)
+        inserted = db.write(lambda cursor: cursor.executemany("""
+            INSERT OR IGNORE INTO Transactions (portfolioOwner, coinTicker, value, quantity, executedAt, importId)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows).rowcount).result() if rows else 0
+        result.imported += inserted
+        result.duplicates += len(rows) - inserted
+
+
+def import_transactions(username, path, progress=None):
+    """imports a csv export for username. blocking - call from a background task"""
+    try:
+        return TransactionImporter(username, progress=progress).import_file(path)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise CSVImportError(f"Unable to read file: {e}")
+    except sqlite3.Error as e:
+        raise CSVImportError(f"Database error: {e}")
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,206 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+db_path = "CryptoApp.db"
+
+BUSY_TIMEOUT = 5000 #ms a connection waits for another one's write lock before giving up
+CACHE_SIZE = 8 * 1024 #KiB of page cache per connection
+MAX_BATCH = 200 #most writes committed together
+BATCH_WINDOW = 0.002 #seconds the writer waits for more writes to commit with the first one
+
+#applied to every new connection. WAL lets reads carry on while another thread writes,
+#and synchronous=NORMAL is safe with WAL (only the last commits can be lost on power failure)
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA cache_size = -{CACHE_SIZE}",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT}",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+)
+
+class Writer:
+    """the one thread that writes to a database. writes are queued and committed in groups -
+    every write waiting (up to MAX_BATCH) shares one transaction and one commit, and as only
+    this thread writes, writers never wait on each other's locks.
+    each write runs in its own savepoint, so one failing doesn't undo the others in its group"""
+    def __init__(self, manager, max_batch=MAX_BATCH, batch_window=BATCH_WINDOW):
+        self.__manager = manager
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.__queue = queue.Queue()
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.writes = 0
+        self.commits = 0
+
+    def submit(self, func, *args, **kwargs):
+        """queues func(cursor, *args, **kwargs) and returns a Future for its result,
+        which is set once the write has been committed"""
+        future = Future()
+        if threading.current_thread() is self.__thread:
+            #a write made by another write (e.g. add_coin_to_list adding the coin) joins its transaction
+            future.set_running_or_notify_cancel()
+            try:
+                with self.__manager.transaction() as cursor:
+                    future.set_result(func(cursor, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name="DatabaseWriter", daemon=True)
+                self.__thread.start()
+        self.__queue.put((future, func, args, kwargs))
+        return future
+
+    def __next_batch(self):
+        """blocks for the first write, then collects any more that arrive within batch_window.
+        returns None once stop() has been called"""
+        item = self.__queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            try:
+                item = self.__queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                self.__queue.put(None) #stop after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def __run(self):
+        while True:
+            batch = self.__next_batch()
+            if batch is None:
+                break
+            self.__commit([item for item in batch if item[0].set_running_or_notify_cancel()])
+
+    def __commit(self, batch):
+        results = []
+        try:
+            with self.__manager.transaction():
+                for future, func, args, kwargs in batch:
+                    try:
+                        with self.__manager.transaction() as cursor: #savepoint for this write only
+                            results.append((future, func(cursor, *args, **kwargs), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e: #begin or commit failed - nothing in the batch was written
+            for future, *_ in batch:
+                future.set_exception(e)
+            return
+        self.writes += len(batch)
+        self.commits += 1
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def stop(self, timeout=5):
+        """finishes every queued write, then stops the thread"""
+        with self.__lock:
+            thread, self.__thread = self.__thread, None
+        if thread is not None:
+            self.__queue.put(None)
+            thread.join(timeout)
+
+    def stats(self):
+        return {"writes": self.writes, "commits": self.commits}
+
+
+class ConnectionManager:
+    """hands out one reusable connection per thread, so a page load doesn't open and close
+    the database for every query. connections are in autocommit mode - reads never hold a
+    transaction open, and writes are sent to the writer thread with write()"""
+    def __init__(self, path=db_path):
+        self.path = path
+        self.__local = threading.local()
+        self.__connections = []
+        self.__lock = threading.Lock()
+        self.writer = Writer(self)
+
+    def connection(self):
+        """returns this thread's connection, opening it the first time"""
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            #check_same_thread is off only so close_all can close every connection at exit
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT / 1000,
+                                         isolation_level=None, check_same_thread=False)
+            for pragma in PRAGMAS:
+                connection.execute(pragma)
+            self.__local.connection = connection
+            self.__local.depth = 0
+            with self.__lock:
+                self.__connections.append(connection)
+        return connection
+
+    def cursor(self):
+        """a cursor for reads on this thread's connection"""
+        return self.connection().cursor()
+
+    def write(self, func, *args, **kwargs):
+        """queues func(cursor, *args, **kwargs) on the writer thread. returns a Future - call
+        .result() to wait for the commit and get func's return value (or its exception)"""
+        return self.writer.submit(func, *args, **kwargs)
+
+    @contextmanager
+    def transaction(self):
+        """with db.transaction() as cursor: ... commits if the block finishes, rolls back if it raises.
+        transactions can be nested (e.g. one db function calling another) - inner ones use savepoints.
+        used by the writer thread - elsewhere only where nothing else can be writing (e.g. migrations)"""
+        connection = self.connection()
+        depth = self.__local.depth
+        cursor = connection.cursor()
+        #IMMEDIATE takes the write lock up front, so two writers can't deadlock upgrading a read lock
+        cursor.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT level{depth}")
+        self.__local.depth = depth + 1
+        try:
+            yield cursor
+        except BaseException:
+            if depth == 0:
+                connection.execute("ROLLBACK")
+            else:
+                connection.execute(f"ROLLBACK TO level{depth}")
+                connection.execute(f"RELEASE level{depth}")
+            raise
+        else:
+            try:
+                connection.execute("COMMIT" if depth == 0 else f"RELEASE level{depth}")
+            except sqlite3.Error:
+                if depth == 0 and connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+        finally:
+            self.__local.depth = depth
+            cursor.close()
+
+    def close_all(self):
+        """finishes queued writes, then closes every thread's connection (on exit)"""
+        self.writer.stop()
+        with self.__lock:
+            connections, self.__connections = self.__connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+        self.__local = threading.local()
+
+
+#shared by every module that uses CryptoApp.db
+db = ConnectionManager()
+
+
+if __name__ == "__main__":
+    pass
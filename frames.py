@@ -1,16 +1,29 @@
 #import required libraries
 import tkinter as tk
 from tkinter import font as tkfont
-from tkinter import simpledialog, messagebox, ttk
-from apifunctions import get_price_tracker_data, get_exchange_rate, get_formatted_news, get_coin_ticker_with_key
+from tkinter import simpledialog, messagebox, ttk, filedialog
+from apifunctions import get_price_tracker_data
+from httpclient import APIError
+from newsfeed import NewsFeed
+from coincatalog import get_coin_ticker, get_coin_id
+from ratecache import rate_cache
 from mathfunctions import round_to_sf, merge_sort
-from sqlcode import (add_new_user, check_username_exists, add_coin_to_list, 
+from sqlcode import (add_new_user, add_coin_to_list, 
                     remove_coin_from_list, add_transaction_to_db, add_coin_to_database, 
-                    fetch_transactions, save_note_to_db, delete_note_from_db, check_ticker_exists,
-                    update_note_title_in_db, get_notes_list, get_note_content)
+                    fetch_transactions, get_position, save_note_to_db, delete_note_from_db, check_ticker_exists,
+                    update_note_title_in_db, get_notes_list, get_note_content, get_coin_name_from_ticker,
+                    search_notes, save_note_content, get_note_revisions, get_note_at)
 from utils import verify_password, get_top_coins
+from tasks import TaskRunner
+from pricepoller import PricePoller
+from csvimport import import_transactions, CSVImportError
+from autosave import NoteAutosaver
+from portfoliohistory import portfolio_history
+import asyncapi
 import webbrowser
 import time
+from datetime import datetime
+from bisect import bisect_right, insort
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
@@ -34,6 +47,31 @@ class LoginDialog(simpledialog.Dialog):
         self.result = (self.username_entry.get(), self.password_entry.get())
 
 
+class LoadingIndicator(tk.Label):
+    """label that shows loading text while a page has background tasks running"""
+    def __init__(self, master, text="Loading...", **kwargs):
+        super().__init__(master, text="", **kwargs)
+        self.loading_text = text
+        self.__count = 0 #number of tasks currently using this indicator
+
+    def start(self):
+        self.__count += 1
+        self.__update_text()
+
+    def stop(self):
+        self.__count = max(0, self.__count - 1)
+        self.__update_text()
+
+    def set_text(self, text):
+        """changes the text shown while loading (e.g. to show progress)"""
+        self.loading_text = text
+        self.__update_text()
+
+    def __update_text(self):
+        if self.winfo_exists(): #page may already have been destroyed
+            self.config(text=self.loading_text if self.__count else "")
+
+
 class CryptoTrackerApp(tk.Tk):
     """main application class"""
     def __init__(self):
@@ -50,6 +88,12 @@ class CryptoTrackerApp(tk.Tk):
         #creates page stack
         self.__pages_stack = []
 
+        #runs network calls and password hashing off the main thread
+        self.tasks = TaskRunner(self)
+        #keeps prices on open pages up to date
+        self.prices = PricePoller(self, self.tasks)
+        self.protocol("WM_DELETE_WINDOW", self.close_app)
+
         #shows login page when program ran
         self.show_login_page()
 
@@ -94,18 +138,30 @@ class CryptoTrackerApp(tk.Tk):
         """removes froms stack, and goes back to previous page - Can exit the whole app if used from the login page"""
         if len(self.__pages_stack) > 1:
             current_page = self.__pages_stack.pop()
+            self.tasks.cancel(current_page)
             current_page.destroy()
             previous_page = self.__pages_stack[-1]
             previous_page.tkraise()
+            self.prices.wake() #previous page may need prices polling again
         else:
-            self.quit()
-            self.destroy()
+            self.close_app()
+
+    def is_current_page(self, page):
+        return bool(self.__pages_stack) and self.__pages_stack[-1] is page
+
+    def close_app(self):
+        """stops background tasks and closes the window"""
+        self.prices.stop()
+        self.tasks.shutdown()
+        self.quit()
+        self.destroy()
         
     def refresh_page(self):
         """refreshes current page by destroying and recreating it"""
         #no error checking needed as stack will never be of length 0 in this case
         current_page = self.__pages_stack.pop()
         page_type = type(current_page)
+        self.tasks.cancel(current_page)
         current_page.destroy()
             
         #creates new instance of same page type
@@ -132,15 +188,23 @@ class LoginPage(tk.Frame):
 
         button_style = {"bg": "#333940", "fg": "#FFEB3B", "font": ("Arial", 14), "padx": 20, "pady": 10, "width": 10}
 
-        login_button = tk.Button(self, text="Login", command=self.login, **button_style)
-        login_button.grid(row=2, column=0, pady=10)
+        self.login_button = tk.Button(self, text="Login", command=self.login, **button_style)
+        self.login_button.grid(row=2, column=0, pady=10)
 
-        signup_button = tk.Button(self, text="Signup", command=self.signup, **button_style)
-        signup_button.grid(row=3, column=0, pady=10)
+        self.signup_button = tk.Button(self, text="Signup", command=self.signup, **button_style)
+        self.signup_button.grid(row=3, column=0, pady=10)
 
         exit_button = tk.Button(self, text="Exit", command=self.exit_app, **button_style)
         exit_button.grid(row=4, column=0, pady=10)
 
+        self.loading = LoadingIndicator(self, text="Please wait...", bg="#607D8B", fg="#FFFFFF", font=("Arial", 12))
+        self.loading.grid(row=5, column=0, sticky="n", pady=10)
+
+    def set_buttons_state(self, state):
+        """stops login/signup being pressed again while one is running"""
+        self.login_button.config(state=state)
+        self.signup_button.config(state=state)
+
     def login(self):
         """called once button is pressed. Logs user in"""
         dialog = LoginDialog(self, title="Login")
@@ -148,13 +212,26 @@ class LoginPage(tk.Frame):
             username, password = dialog.result
             if not username or not password:
                 messagebox.showerror("Error", "Either Username or Password is Blank. Try again")
-            else:  
-                if check_username_exists(username) and verify_password(password, username):
-                    global logged_in_user 
-                    logged_in_user = username
-                    self.master.show_home_page()
-                else:
-                    messagebox.showerror("Error", "Incorrect Username or Password")
+            else:
+                #password hashing is slow so it is done on a worker thread
+                self.set_buttons_state(tk.DISABLED)
+                self.master.tasks.submit(self, self.check_login, username, password,
+                                         on_success=lambda valid: self.on_login_checked(username, valid),
+                                         on_error=self.on_task_error, indicator=self.loading)
+
+    @staticmethod
+    def check_login(username, password):
+        """runs on worker thread - returns whether the login details are correct"""
+        return verify_password(password, username)
+
+    def on_login_checked(self, username, valid):
+        self.set_buttons_state(tk.NORMAL)
+        if valid:
+            global logged_in_user
+            logged_in_user = username
+            self.master.show_home_page()
+        else:
+            messagebox.showerror("Error", "Incorrect Username or Password")
             
     def signup(self):
         """creates account - handles signup functionality"""
@@ -165,17 +242,38 @@ class LoginPage(tk.Frame):
             if not username or not password:
                 messagebox.showerror("Error", "Either Username or Password is Blank. Try again")
             else:
-                success = add_new_user(username, password)
-                if success:
-                    self.add_default_coins(username)
-                    messagebox.showinfo("Success", "New Account Created")
-                else:
-                    messagebox.showerror("Error", "Username Already Exists. Try Again")
+                self.set_buttons_state(tk.DISABLED)
+                self.master.tasks.submit(self, self.create_account, username, password,
+                                         on_success=self.on_account_created,
+                                         on_error=self.on_task_error, indicator=self.loading)
+
+    @classmethod
+    def create_account(cls, username, password):
+        """runs on worker thread - adds user (hashing their password) and their default coins"""
+        success = add_new_user(username, password)
+        if success:
+            cls.add_default_coins(username)
+        return success
+
+    def on_account_created(self, success):
+        self.set_buttons_state(tk.NORMAL)
+        if success:
+            messagebox.showinfo("Success", "New Account Created")
+        else:
+            messagebox.showerror("Error", "Username Already Exists. Try Again")
+
+    def on_task_error(self, error):
+        self.set_buttons_state(tk.NORMAL)
+        messagebox.showerror("Error", f"Something went wrong, try again.\n\nError: {error}")
     
-    def add_default_coins(self, username):
+    @staticmethod
+    def add_default_coins(username):
         """adds default coins (BTC and ETH) to new user's watchlist"""
         for name in ["bitcoin","ethereum"]:
-            add_coin_to_list(username, name)
+            try:
+                add_coin_to_list(username, name)
+            except APIError as e: #the account is still created - coins can be added later
+                print(f"Unable to add {name} to the new watchlist: {e}")
 
     def exit_app(self):
         self.master.go_back()
@@ -190,8 +288,12 @@ class HomePage(tk.Frame):
         self.grid_columnconfigure(1, weight=2, minsize=200)
         self.grid_rowconfigure(1, weight=1)
 
-        self.news_page = 1
-        self.previous_news = None
+        self.news_feed = NewsFeed()
+        self.story_dates = [] #publish dates of stories shown, oldest first
+        self.fetching_page = None #page being fetched in the background
+        self.prefetched_page = None #next page, fetched while the user reads
+        self.show_when_fetched = False
+        self.waiting_for_prefetch = False
 
         self.create_widgets()
 
@@ -229,6 +331,9 @@ class HomePage(tk.Frame):
         news_label = tk.Label(right_frame, text="News", bg="#333940", fg="#FFEB3B", font=("Arial", 12, "bold"))
         news_label.grid(row=0, column=0, pady=5, sticky="ew")
 
+        self.loading = LoadingIndicator(right_frame, text="Loading news...", bg="#333940", fg="#FFFFFF", font=("Arial", 10))
+        self.loading.grid(row=0, column=0, padx=5, sticky="e")
+
         #ceates treeview with 3 columns
         self.news_tree = ttk.Treeview(right_frame, columns=("title", "ticker", "date"), show="headings")
         self.news_tree.heading("title", text="Title")
@@ -246,23 +351,93 @@ class HomePage(tk.Frame):
 
         #binds double-click event
         self.news_tree.bind("<Double-1>", self.on_news_click)
-        self.get_more_news()
+
+        #stories from last time are shown straight away, then updated
+        self.add_stories(self.news_feed.cached_posts())
+        self.load_startup_data()
+
+    def load_startup_data(self):
+        """loads first page of news, warming the price cache for the other pages at the same time"""
+        self.fetching_page = 1
+        self.show_when_fetched = True
+        self.master.tasks.submit(self, self.fetch_startup_data, logged_in_user,
+                                 on_success=self.on_page_fetched, on_error=self.on_news_error, indicator=self.loading)
+
+    @staticmethod
+    def fetch_startup_data(username):
+        """runs on worker thread - fetches news and watchlist prices in parallel"""
+        coins = get_top_coins(username)
+        results = asyncapi.fetch_batch({
+            "news": (asyncapi.run_blocking, NewsFeed.fetch_page, 1),
+            "prices": (asyncapi.get_price_tracker_data, coins),
+        })
+        if isinstance(results["news"], Exception):
+            raise results["news"]
+        return results["news"]
+
+    def fetch_news_page(self, page, show):
+        """fetches a page in the background - shown when it arrives if show, otherwise kept for later"""
+        self.fetching_page = page
+        self.show_when_fetched = show
+        self.master.tasks.submit(self, NewsFeed.fetch_page, page, on_success=self.on_page_fetched,
+                                 on_error=self.on_news_error, indicator=self.loading if show else None)
 
     def get_more_news(self):
-        """fetches and displays more news stories"""
-        news_stories = get_formatted_news(f"&page={self.news_page}")
-        if self.previous_news == news_stories:
-            self.news_tree.insert("", "end", values=("END OF STORIES", "N/A", "N/A"), tags=("END"))
-            self.previous_news = "END"
-            messagebox.showinfo("End of Stories", "All available stories have been shown")
-        elif self.previous_news == "END":
+        """shows the next page of news - instantly if it has already been prefetched"""
+        if self.news_feed.finished:
             messagebox.showinfo("End of Stories", "All available stories have been shown")
+        elif self.prefetched_page:
+            page_data, self.prefetched_page = self.prefetched_page, None
+            self.show_news(page_data)
+        elif self.fetching_page is not None: #still prefetching - show it once it arrives
+            if not self.show_when_fetched:
+                self.show_when_fetched = True
+                self.waiting_for_prefetch = True
+                self.loading.start()
+        else:
+            self.fetch_news_page(self.news_feed.next_page, show=True)
+
+    def on_page_fetched(self, page_data):
+        self.fetching_page = None
+        if self.waiting_for_prefetch:
+            self.waiting_for_prefetch = False
+            self.loading.stop()
+        if self.show_when_fetched or page_data[0] == 1:
+            self.show_news(page_data)
         else:
-            for story in news_stories:
-                title, ticker, date, link = story["title"], story["ticker"], story["published_at"], story["url"]
-                self.news_tree.insert("", "end", values=(title, ticker, date), tags=(link))
-            self.previous_news = news_stories
-            self.news_page += 1
+            self.prefetched_page = page_data
+
+    def on_news_error(self, error):
+        self.fetching_page = None
+        if self.waiting_for_prefetch:
+            self.waiting_for_prefetch = False
+            self.loading.stop()
+        if self.show_when_fetched:
+            messagebox.showerror("Error", f"Unable to load news, try again.\n\nError: {error}")
+
+    def show_news(self, page_data):
+        """displays stories from a fetched page that haven't been shown yet, then prefetches the next page"""
+        page, news_stories, has_next = page_data
+        new_stories = self.news_feed.take_new(news_stories)
+        self.add_stories(new_stories)
+        self.news_feed.page_loaded(page, has_next)
+
+        if self.news_feed.finished:
+            self.news_tree.insert("", "end", values=("END OF STORIES", "N/A", "N/A"), tags=("END"))
+            if page > 1:
+                messagebox.showinfo("End of Stories", "All available stories have been shown")
+        elif not new_stories and page > 1: #every story was already shown - carry on to the next page
+            self.fetch_news_page(self.news_feed.next_page, show=True)
+        else:
+            self.fetch_news_page(self.news_feed.next_page, show=False)
+
+    def add_stories(self, stories):
+        """inserts stories into the tree, keeping it in newest first order"""
+        for story in stories:
+            title, ticker, date, link = story["title"], story["ticker"], story["published_at"], story["url"]
+            index = len(self.story_dates) - bisect_right(self.story_dates, date)
+            insort(self.story_dates, date)
+            self.news_tree.insert("", index, values=(title, ticker, date), tags=(link))
 
     def on_news_click(self, event):
         """opens news story in browser when double clicked"""
@@ -332,6 +507,9 @@ class PriceTrackerPage(tk.Frame):
                                 font=("Arial", 10), padx=8, pady=4, width=8, command=self.refresh_data)
         refresh_btn.grid(row=0, column=1, padx=(0, 10), pady=5, sticky="w")
 
+        self.loading = LoadingIndicator(back_refresh_frame, bg="#607D8B", fg="#FFFFFF", font=("Arial", 10))
+        self.loading.grid(row=0, column=2, padx=(0, 10), pady=5, sticky="w")
+
         #top coins section
         top_coins_frame = tk.Frame(self, bg="#333940", padx=10, pady=10)
         top_coins_frame.grid(row=2, column=0, columnspan=2, sticky="nsew", padx=10, pady=10)
@@ -354,36 +532,65 @@ class PriceTrackerPage(tk.Frame):
         
         self.coin_list.pack(fill=tk.BOTH, expand=True)
 
+        self.master.prices.subscribe(self, [], self.update_prices)
         self.load_price_data()
 
         #configures grid
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(2, weight=1)
 
-    def load_price_data(self):
-        """fetches and displays price data for watched coins"""
+    def load_price_data(self, on_complete=None, max_age=None):
+        """fetches price data for watched coins in the background.
+        max_age=0 skips the price cache"""
+        def loaded(data):
+            self.show_price_data(data)
+            if on_complete:
+                on_complete()
+
+        self.master.tasks.submit(self, self.fetch_price_data, logged_in_user, max_age,
+                                 on_success=loaded, on_error=self.on_task_error, indicator=self.loading)
+
+    @staticmethod
+    def fetch_price_data(username, max_age=None):
+        """runs on worker thread - gets the user's watchlist and its prices"""
+        coins = get_top_coins(username)
+        return get_price_tracker_data(coins, max_age)
+
+    def on_task_error(self, error):
+        messagebox.showerror("Error", f"Unable to load data, try again.\n\nError: {error}")
+
+    def show_price_data(self, data):
+        """displays price data for watched coins"""
         # Clear existing items
         for item in self.coin_list.get_children():
             self.coin_list.delete(item)
-            
-        coins = get_top_coins(logged_in_user)
-        if len(coins) > 100:
-            coins = coins[:100]
 
-        data = get_price_tracker_data(coins)
-        for x, values in data.items():
+        for coin_id, values in data.items():
             if values:
-                formatted_values = (
-                    values[0],                           #name
-                    values[1].upper(),                   #ticker
-                    f"${values[2]:,.2f}",               #price
-                    f"{values[3]:.2f}%",                #1h Change
-                    f"{values[4]:.2f}%",                #24h Change
-                    f"{values[5]:.2f}%",                #7d Change
-                    f"${values[6]:,.2f}",               #market Cap
-                    values[7] if values[7] else "N/A"    #rank
-                )
-                self.coin_list.insert("", 0, values=formatted_values)
+                self.coin_list.insert("", 0, iid=coin_id, values=self.format_price_row(values))
+
+        #the poller keeps these rows up to date from now on
+        self.master.prices.record(data)
+        self.master.prices.set_coins(self, data.keys())
+
+    def update_prices(self, changed):
+        """called by the price poller with only the coins whose prices changed"""
+        for coin_id, values in changed.items():
+            if self.coin_list.exists(coin_id):
+                self.coin_list.item(coin_id, values=self.format_price_row(values))
+
+    @staticmethod
+    def format_price_row(values):
+        return (
+            values[0],                           #name
+            values[1].upper(),                   #ticker
+            f"${values[2]:,.2f}",               #price
+            f"{values[3]:.2f}%",                #1h Change
+            f"{values[4]:.2f}%",                #24h Change
+            f"{values[5]:.2f}%",                #7d Change
+            f"${values[6]:,.2f}",               #market Cap
+            values[7] if values[7] else "N/A"    #rank
+        )
 
     def add_coin(self):
         """handles adding a new coin to watchlist"""
@@ -398,7 +605,12 @@ class PriceTrackerPage(tk.Frame):
         else:
             ticker = coin
             
-        success = add_coin_to_list(logged_in_user, ticker)
+        #checking the coin exists needs an api call so it is done in the background
+        self.master.tasks.submit(self, add_coin_to_list, logged_in_user, ticker,
+                                 on_success=lambda success: self.on_coin_added(coin, success),
+                                 on_error=self.on_task_error, indicator=self.loading)
+
+    def on_coin_added(self, coin, success):
         if success:
             messagebox.showinfo("Success", f"{coin.upper()} has been added to your list.")
             self.load_price_data()
@@ -489,8 +701,11 @@ class PriceTrackerPage(tk.Frame):
         self.master.go_back()
 
     def refresh_data(self):
-        self.load_price_data()
-        messagebox.showinfo("Success","Refresh Complete")
+        self.load_price_data(on_complete=lambda: messagebox.showinfo("Success","Refresh Complete"), max_age=0)
+
+    def destroy(self):
+        self.master.prices.unsubscribe(self)
+        super().destroy()
 
 class PortfolioOverviewPage(tk.Frame):
     def __init__(self, master):
@@ -510,7 +725,9 @@ class PortfolioOverviewPage(tk.Frame):
         #in each tuple: button_name, command
         other_buttons = [
             ("Add Transaction", self.add_transaction),
+            ("Import CSV", self.import_csv),
             ("Graphs", self.get_chart),
+            ("History", self.get_value_history),
             ("Filters", self.filters),
             ("Sort By", self.sort)
         ]
@@ -532,6 +749,9 @@ class PortfolioOverviewPage(tk.Frame):
                                 font=("Arial", 10), padx=8, pady=4, width=8, command=self.refresh_data)
         refresh_btn.grid(row=0, column=1, padx=(0, 10), pady=5, sticky="w")
 
+        self.loading = LoadingIndicator(back_refresh_frame, bg="#607D8B", fg="#FFFFFF", font=("Arial", 10))
+        self.loading.grid(row=0, column=2, padx=(0, 10), pady=5, sticky="w")
+
         #top coins section
         portfolio_frame = tk.Frame(self, bg="#333940", padx=10, pady=10)
         portfolio_frame.grid(row=2, column=0, columnspan=2, sticky="nsew", padx=10, pady=10)
@@ -546,6 +766,9 @@ class PortfolioOverviewPage(tk.Frame):
             self.portfolio_list.heading(col, text=col)
         self.portfolio_list.pack(fill=tk.BOTH, expand=True)
 
+        self.holdings = {} #ticker -> {'quantity', 'total_value'}
+        self.coin_ids = {} #ticker -> coingecko id
+        self.master.prices.subscribe(self, [], self.update_prices)
         self.load_portfolio_data()
 
         #configures grid
@@ -553,8 +776,15 @@ class PortfolioOverviewPage(tk.Frame):
         self.grid_rowconfigure(2, weight=1)
 
     def load_portfolio_data(self):
-        """loads and displays portfolio transaction data"""
-        transactions = fetch_transactions(logged_in_user)
+        """loads portfolio transaction data and prices in the background"""
+        self.master.tasks.submit(self, self.fetch_portfolio_data, logged_in_user,
+                                 on_success=self.show_portfolio_data, on_error=self.on_task_error,
+                                 indicator=self.loading)
+
+    @staticmethod
+    def fetch_portfolio_data(username):
+        """runs on worker thread - returns the user's holdings, their coin ids and current prices"""
+        transactions = fetch_transactions(username)
         
         valid_coin_ids = []
         coin_info_cache = {}
@@ -563,20 +793,29 @@ class PortfolioOverviewPage(tk.Frame):
             coin_id = ("bitcoin" if coin.upper() == "BTC" else 
                     "ethereum" if coin.upper() == "ETH" else 
                     "dogecoin" if coin.upper() == "DOGE" else 
-                    "ripple" if coin.upper() in ["XRP","RLUSD"] else coin.lower())
+                    "ripple" if coin.upper() in ["XRP","RLUSD"] else 
+                    get_coin_id(coin, get_coin_name_from_ticker(coin)) or coin.lower())
             valid_coin_ids.append(coin_id)
             coin_info_cache[coin] = coin_id
-                
-        if not valid_coin_ids:
+
+        current_prices = get_price_tracker_data(valid_coin_ids) if valid_coin_ids else {}
+        return transactions, coin_info_cache, current_prices
+
+    def on_task_error(self, error):
+        messagebox.showerror("Error", f"Unable to load data, try again.\n\nError: {error}")
+
+    def show_portfolio_data(self, portfolio_data):
+        """displays portfolio transaction data"""
+        transactions, coin_info_cache, current_prices = portfolio_data
+        self.portfolio_list.delete(*self.portfolio_list.get_children())
+        self.holdings = transactions
+        self.coin_ids = coin_info_cache
+
+        if not coin_info_cache:
             messagebox.showwarning("No Data", "No valid coin data available to display.")
             return
-                
-        current_prices = get_price_tracker_data(valid_coin_ids)
         
         for coin, data in transactions.items():
-            quantity = data['quantity']
-            price_bought = data['total_value']
-            
             coin_id = coin_info_cache[coin]
             coin_data = current_prices.get(coin_id, [])
             current_price = coin_data[2] if coin_data and len(coin_data) >= 3 else 0
@@ -584,19 +823,37 @@ class PortfolioOverviewPage(tk.Frame):
             if current_price == 0:
                 print(f"Warning: No price data available for {coin}")
             
-            value_now = quantity * current_price
-            gain_loss = value_now - price_bought
-            percent_gain_loss = (gain_loss / price_bought) * 100 if price_bought != 0 else 0
-            
-            self.portfolio_list.insert("", "end", values=(
-                coin,
-                f"${current_price:.2f}",
-                f"{quantity:.8f}",
-                f"${value_now:.2f}",
-                f"${price_bought:.2f}",
-                f"${gain_loss:.2f}",
-                f"{percent_gain_loss:.2f}%"
-            ))
+            self.portfolio_list.insert("", "end", iid=coin, values=self.portfolio_row(coin, data, current_price))
+
+        #the poller keeps these rows up to date from now on
+        self.master.prices.record(current_prices)
+        self.master.prices.set_coins(self, coin_info_cache.values())
+
+    def update_prices(self, changed):
+        """called by the price poller with only the coins whose prices changed"""
+        for coin, coin_id in self.coin_ids.items():
+            if coin_id in changed and self.portfolio_list.exists(coin):
+                self.portfolio_list.item(coin, values=self.portfolio_row(coin, self.holdings[coin],
+                                                                         changed[coin_id][2]))
+
+    @staticmethod
+    def portfolio_row(coin, data, current_price):
+        quantity = data['quantity']
+        price_bought = data['total_value']
+
+        value_now = quantity * current_price
+        gain_loss = value_now - price_bought
+        percent_gain_loss = (gain_loss / price_bought) * 100 if price_bought != 0 else 0
+
+        return (
+            coin,
+            f"${current_price:.2f}",
+            f"{quantity:.8f}",
+            f"${value_now:.2f}",
+            f"${price_bought:.2f}",
+            f"${gain_loss:.2f}",
+            f"{percent_gain_loss:.2f}%"
+        )
 
     def add_transaction(self):
         coin_id = simpledialog.askstring("Add Coin", "Enter the name of the coin:").lower()
@@ -611,49 +868,82 @@ class PortfolioOverviewPage(tk.Frame):
             return
         value = round(float(value),2)
 
-        try:
-            coin_ticker = get_coin_ticker_with_key(coin_id)
-            if not coin_ticker:
-                messagebox.showerror("Error", f"{coin_id} is not a valid coin")
-                return
-        except Exception as e:
-            messagebox.showerror("Unexpected Error", 
-                                 f"An unexpected error occurred while fetching coin data.\n\nError: {str(e)}")
+        #ticker lookup and price fetch need api calls so are done in the background
+        self.master.tasks.submit(self, self.prepare_transaction, logged_in_user, coin_id, value,
+                                 on_success=lambda details: self.confirm_transaction(coin_id, value, details),
+                                 on_error=self.on_transaction_error, indicator=self.loading)
+
+    def import_csv(self):
+        """imports transactions from an exchange's csv export in the background"""
+        path = filedialog.askopenfilename(title="Import Transactions",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
             return
-    
-        
+        if self.master.tasks.is_busy(self):
+            messagebox.showwarning("Busy", "Please wait for the current task to finish.")
+            return
+
+        self.import_progress = 0.0 #set from the worker thread, shown by show_import_progress
+        self.loading.set_text("Importing... 0%")
+        self.master.tasks.submit(self, import_transactions, logged_in_user, path,
+                                 progress=lambda fraction: setattr(self, "import_progress", fraction),
+                                 on_success=self.on_csv_imported, on_error=self.on_import_error,
+                                 indicator=self.loading)
+        self.after(200, self.show_import_progress)
+
+    def show_import_progress(self):
+        if not self.master.tasks.is_busy(self):
+            self.loading.set_text("Loading...")
+            return
+        self.loading.set_text(f"Importing... {self.import_progress:.0%}")
+        self.after(200, self.show_import_progress)
+
+    def on_csv_imported(self, result):
+        messagebox.showinfo("Import Complete", result.summary())
+        if result.imported:
+            self.refresh_data()
+
+    def on_import_error(self, error):
+        if isinstance(error, CSVImportError):
+            messagebox.showerror("Import Failed", str(error))
+        else:
+            messagebox.showerror("Import Failed", f"Something went wrong, try again.\n\nError: {error}")
+
+    @staticmethod
+    def prepare_transaction(username, coin_id, value):
+        """runs on worker thread - validates the transaction, returning (ticker, price, quantity).
+        raises ValueError with a message for the user if it isn't valid"""
+        coin_ticker = get_coin_ticker(coin_id)
+        if not coin_ticker:
+            raise ValueError(f"{coin_id} is not a valid coin")
+
         #ensures no negative balance
         current_prices = get_price_tracker_data([coin_id]) 
         current_price = current_prices.get(coin_id, [None, None, None])[2]
 
         if current_price is None or current_price == 0:
-            messagebox.showerror("Error", f"Unable to fetch current price for {coin_ticker} (ID: {coin_id}).")
-            return
+            raise ValueError(f"Unable to fetch current price for {coin_ticker} (ID: {coin_id}).")
         
         quantity = value / current_price
     
-        transactions = fetch_transactions(logged_in_user)
-        current_quantity = transactions.get(coin_ticker, {'quantity': 0})['quantity']
+        position = get_position(username, coin_ticker)
+        current_quantity = position['quantity'] if position else 0
         
         if value < 0 and abs(quantity) > current_quantity:
-            messagebox.showerror("Error", 
-                                 f"Transaction would result in negative balance. Current holdings: {current_quantity:.8f}")
-            return
+            raise ValueError(f"Transaction would result in negative balance. Current holdings: {current_quantity:.8f}")
 
-        #adds to db if not exists in coin table
-        exists = check_ticker_exists(coin_ticker)
-        if not exists:
-            add_coin_to_database(coin_ticker, coin_id)
+        return coin_ticker, current_price, quantity
 
-        current_prices = get_price_tracker_data([coin_id]) 
-        current_price = current_prices.get(coin_id, [None, None, None])[2]
-    
-        if current_price is None or current_price == 0:
-            messagebox.showerror("Error", 
-                                 f"Unable to fetch current price for {coin_ticker} (ID: {coin_id}).")
-            return
-        
-        quantity = value / current_price
+    def on_transaction_error(self, error):
+        if isinstance(error, ValueError):
+            messagebox.showerror("Error", str(error))
+        else:
+            messagebox.showerror("Unexpected Error", 
+                                 f"An unexpected error occurred while fetching coin data.\n\nError: {str(error)}")
+
+    def confirm_transaction(self, coin_id, value, details):
+        """asks user to confirm the transaction, then saves it in the background"""
+        coin_ticker, current_price, quantity = details
         confirm_msg = f"You are about to add a transaction:\n\n" \
                     f"Coin: {coin_id}\n" \
                     f"Value: ${value:.2f}\n" \
@@ -664,7 +954,19 @@ class PortfolioOverviewPage(tk.Frame):
         if not messagebox.askyesno("Confirm Transaction", confirm_msg):
             return
 
-        success = add_transaction_to_db(logged_in_user, coin_ticker, value, quantity)
+        self.master.tasks.submit(self, self.save_transaction, logged_in_user, coin_id, coin_ticker, value, quantity,
+                                 on_success=lambda success: self.on_transaction_saved(value, quantity, success),
+                                 on_error=self.on_transaction_error, indicator=self.loading)
+
+    @staticmethod
+    def save_transaction(username, coin_id, coin_ticker, value, quantity):
+        """runs on worker thread - adds coin to db if not exists in coin table, then the transaction"""
+        exists = check_ticker_exists(coin_ticker)
+        if not exists:
+            add_coin_to_database(coin_ticker, coin_id)
+        return add_transaction_to_db(username, coin_ticker, value, quantity)
+
+    def on_transaction_saved(self, value, quantity, success):
         if success:
             messagebox.showinfo("Success", f"Transaction added successfully. Value: ${value:.2f}, Quantity: {quantity:.8f}")
             self.refresh_data()
@@ -786,7 +1088,6 @@ class PortfolioOverviewPage(tk.Frame):
 
         def reset_filters():
             #reload all portfolio data
-            self.portfolio_list.delete(*self.portfolio_list.get_children())
             self.load_portfolio_data()
             filter_dialog.destroy()
 
@@ -889,11 +1190,48 @@ class PortfolioOverviewPage(tk.Frame):
                             font=("Arial", 12, "bold"))
         total_label.pack(pady=10)
 
+    def get_value_history(self):
+        """tops up the price history of every coin held and values the portfolio over time, in the background"""
+        self.master.tasks.submit(self, portfolio_history, logged_in_user, coin_ids=dict(self.coin_ids), top_up=True,
+                                 on_success=self.show_value_history, on_error=self.on_task_error,
+                                 indicator=self.loading)
+
+    def show_value_history(self, history):
+        if not len(history.timestamps) or not history.tickers:
+            messagebox.showinfo("Info", "No transactions to show a history for.")
+            return
+
+        history_window = tk.Toplevel(self)
+        history_window.title("Portfolio Value History")
+        history_window.geometry("800x500")
+
+        dates = [datetime.fromtimestamp(timestamp) for timestamp in history.timestamps.tolist()]
+        fig = Figure(figsize=(10, 5))
+        ax = fig.add_subplot(111)
+        ax.plot(dates, history.value, label="Value")
+        ax.plot(dates, history.invested, label="Invested", linestyle="--")
+        ax.set_title("Portfolio Value Over Time")
+        ax.set_ylabel("USD")
+        ax.legend()
+        fig.autofmt_xdate()
+
+        canvas = FigureCanvasTkAgg(fig, master=history_window)
+        canvas.draw()
+        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+
+        if history.unpriced:
+            tk.Label(history_window, text=f"Missing price history for: {', '.join(history.unpriced)}",
+                     font=("Arial", 10)).pack(pady=5)
+
     def go_back(self):
         self.master.go_back()
 
     def refresh_data(self):
         self.master.refresh_page()
+
+    def destroy(self):
+        self.master.prices.unsubscribe(self)
+        super().destroy()
     
 
 class FiatConverterPage(tk.Frame):
@@ -903,7 +1241,8 @@ class FiatConverterPage(tk.Frame):
         self.currency1 = "GBP" 
         self.currency2 = "USD"
         self.amount = 0
-        self.rate = get_exchange_rate(self.currency1, self.currency2)
+        self.rate = None #worked out from the shared rate matrix once it is loaded
+        self.refresh_after_id = None
         self.currencies = ['AUD', 'BGN', 'BRL', 'CAD', 'CHF', 'CNY', 'CZK', 'DKK', 'EUR', 'GBP', 'HKD',
                            'HRK', 'HUF', 'IDR', 'ILS', 'INR', 'ISK', 'JPY', 'KRW', 'MXN', 'MYR', 'NOK', 
                            'NZD', 'PHP', 'PLN', 'RON', 'RUB', 'SEK', 'SGD', 'THB', 'TRY', 'USD', 'ZAR']
@@ -939,12 +1278,18 @@ class FiatConverterPage(tk.Frame):
         white_area.pack(expand=True, fill=tk.BOTH, padx=15, pady=15)
 
         #conversion ratio
-        self.ratio_label = tk.Label(white_area, 
-                                    text=f"Ratio 1 : {round_to_sf(self.rate,3) if self.rate < 1 else round(self.rate,3)}", 
+        self.ratio_label = tk.Label(white_area, text="Ratio 1 : ...", 
                                     font=("Arial", 12), bg="#4682B4", fg="white", padx=5, pady=2) 
                                     #self. because needs to be edited
         self.ratio_label.pack(pady=(20, 10))
 
+        self.loading = LoadingIndicator(white_area, text="Loading rates...", bg="white", fg="black", font=("Arial", 10))
+        self.loading.pack()
+
+        #shows when rates were last updated, and if they are out of date
+        self.rates_status_label = tk.Label(white_area, text="", bg="white", fg="grey", font=("Arial", 10))
+        self.rates_status_label.pack()
+
         #conversion frame
         conversion_frame = tk.Frame(white_area, bg="white")
         conversion_frame.pack(pady=20)
@@ -1004,10 +1349,53 @@ class FiatConverterPage(tk.Frame):
         self.currency1_var.trace_add('write', self.update_currency1)
         self.currency2_var.trace_add('write', self.update_currency2)
 
+        self.load_rates()
+
+    def load_rates(self):
+        """loads the shared rate matrix in the background (from the database, or the api if stale)"""
+        self.master.tasks.submit(self, rate_cache.load, on_success=self.on_rates_loaded,
+                                 on_error=self.on_rate_error, indicator=self.loading)
+
+    def refresh_rates(self):
+        """scheduled refresh of the rate matrix"""
+        self.master.tasks.submit(self, rate_cache.refresh, on_success=self.on_rates_loaded,
+                                 on_error=self.on_rate_error, indicator=self.loading)
+
+    def on_rates_loaded(self, matrix):
+        if matrix is None:
+            self.rates_status_label.config(text="Exchange rates unavailable - check connection", fg="red")
+        else:
+            self.update_rates_status()
+            self.apply_rate()
+        #checks again once the current rates are due a refresh
+        delay = rate_cache.refresh_interval - matrix.age() if matrix else 60
+        self.refresh_after_id = self.after(int(max(delay, 60) * 1000), self.refresh_rates)
+
+    def on_rate_error(self, error):
+        messagebox.showerror("Error", f"Unable to get exchange rates, try again.\n\nError: {error}")
+
+    def update_rates_status(self):
+        matrix = rate_cache.matrix
+        updated = time.strftime("%d/%m/%Y %H:%M", time.localtime(matrix.fetched_at))
+        if rate_cache.is_stale():
+            self.rates_status_label.config(text=f"Rates from {updated} - may be out of date", fg="red")
+        else:
+            self.rates_status_label.config(text=f"Rates updated {updated}", fg="grey")
+
+    def apply_rate(self):
+        """works out the rate for the current pair locally from the rate matrix"""
+        self.rate = rate_cache.get_rate(self.currency1, self.currency2)
+        self.update_ratio_label()
+        self.add_output_data(self.convert_currency())
+
+    def update_ratio_label(self):
+        if self.rate is None:
+            self.ratio_label.config(text="Ratio 1 : ...")
+        else:
+            self.ratio_label.config(text=f"Ratio 1 : {round_to_sf(self.rate,3) if self.rate < 1 else round(self.rate,3)}")
+
     def swap(self):
         """swaps selected currencies and updates conversion rate"""
-        self.rate = 1/self.rate
-        self.ratio_label.config(text=f"Ratio 1 : {round_to_sf(self.rate,3) if self.rate < 1 else round(self.rate,3)}")
         self.currency1 = self.currency2_var.get()
         self.currency2 = self.currency1_var.get()
         self.pair_label.config(text=f"{self.currency1} - {self.currency2}")
@@ -1043,6 +1431,8 @@ class FiatConverterPage(tk.Frame):
         self.output_entry.config(state='readonly')
        
     def convert_currency(self):
+        if self.rate is None:
+            return f"{0:.2f}"
         result = self.amount * self.rate 
         return f"{result:.2f}"
 
@@ -1052,29 +1442,39 @@ class FiatConverterPage(tk.Frame):
     def update_currency1(self, *args):
         """updates first currency and recalculates rate"""
         self.currency1 = self.currency1_var.get()
-        self.rate = get_exchange_rate(self.currency1, self.currency2)
-        self.ratio_label.config(text=f"Ratio 1 : {round_to_sf(self.rate,3) if self.rate < 1 else round(self.rate,3)}")
+        self.apply_rate()
         self.pair_label.config(text=f"{self.currency1} - {self.currency2}")
         self.after(10, self.focus_input_entry)
 
     def update_currency2(self, *args):
         """updates second currency and recalculates rate"""
         self.currency2 = self.currency2_var.get()
-        self.rate = (get_exchange_rate(self.currency1, self.currency2))
-        self.ratio_label.config(text=f"Ratio 1 : {round_to_sf(self.rate,3) if self.rate < 1 else round(self.rate,3)}")
+        self.apply_rate()
         self.pair_label.config(text=f"{self.currency1} - {self.currency2}")
         self.after(10, self.focus_input_entry)
 
     def focus_input_entry(self):
         """sets focus to input field and selects content"""
         self.input_entry.focus_set()
+
+    def destroy(self):
+        """stops the scheduled rate refresh when the page is closed"""
+        if self.refresh_after_id:
+            self.after_cancel(self.refresh_after_id)
+        super().destroy()
         
 
 class NotesPage(tk.Frame):
+    SEARCH_DELAY = 150 #ms after the last keystroke before searching
+
     def __init__(self, master):
         super().__init__(master, bg="#607D8B")
         self.master = master
         self.note_map = {}
+        self.note_titles = {} #note id -> title (the list shows snippets too while searching)
+        self.search_after_id = None
+        self.autosaver = NoteAutosaver(self, master.tasks,
+                                       lambda note_id, content: save_note_content(logged_in_user, note_id, content))
         self.create_widgets()
 
     def create_widgets(self):
@@ -1095,6 +1495,7 @@ class NotesPage(tk.Frame):
             ("New Note", self.new_note),
             ("Save", self.save_note),
             ("Delete", self.delete_note),
+            ("History", self.show_history),
         ]
 
         for index, (text, command) in enumerate(other_buttons):
@@ -1111,6 +1512,11 @@ class NotesPage(tk.Frame):
         notes_label = tk.Label(notes_list_frame, text="Notes", font=("Arial", 14), bg="#333940", fg="#FFEB3B", pady=5)
         notes_label.pack(side=tk.TOP, anchor="w")
 
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(notes_list_frame, textvariable=self.search_var, font=("Arial", 12))
+        search_entry.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
+        self.search_var.trace_add('write', self.on_search_changed)
+
         self.notes_list = tk.Listbox(notes_list_frame, bg="white", fg="black", font=("Arial", 12), width=40)
         self.notes_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.notes_list.bind('<<ListboxSelect>>', self.on_select)
@@ -1128,6 +1534,7 @@ class NotesPage(tk.Frame):
 
         self.note_content = tk.Text(note_content_frame, wrap=tk.WORD, bg="white", fg="black", font=("Arial", 12))
         self.note_content.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.note_content.bind("<<Modified>>", self.on_content_modified)
 
         content_scrollbar = tk.Scrollbar(note_content_frame, orient="vertical", command=self.note_content.yview)
         content_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -1139,16 +1546,24 @@ class NotesPage(tk.Frame):
         self.load_notes()
 
     def load_notes(self):
-        """retrieves and displays user's saved notes"""
+        """retrieves and displays user's saved notes - or, while there is search text,
+        the matching notes (best match first) with a snippet of where they matched"""
         self.notes_list.delete(0, tk.END)
         self.note_map = {}  #dictionary to store note IDs
-        
-        notes = get_notes_list(logged_in_user)
-        for note_id, title in notes:
+        self.note_titles = {}
+
+        search_text = self.search_var.get()
+        if search_text.strip():
+            notes = [(note_id, title, f"{title} - {' '.join(snippet.split())}")
+                     for note_id, title, snippet in search_notes(logged_in_user, search_text)]
+        else:
+            notes = [(note_id, title, title) for note_id, title in get_notes_list(logged_in_user)]
+        for note_id, title, text in notes:
             index = self.notes_list.size()
-            self.notes_list.insert(tk.END, title)
+            self.notes_list.insert(tk.END, text)
             self.note_map[index] = note_id
-        
+            self.note_titles[note_id] = title
+
         if self.notes_list.size() > 0:
             self.notes_list.selection_set(0)
             self.on_select(None)
@@ -1158,6 +1573,8 @@ class NotesPage(tk.Frame):
         if not self.notes_list.curselection():
             return
 
+        #saves edits to the note being left before its content is replaced
+        self.autosaver.flush()
         index = self.notes_list.curselection()[0]
         self.current_note_id = self.note_map[index]
         
@@ -1168,6 +1585,28 @@ class NotesPage(tk.Frame):
         content = get_note_content(self.current_note_id)
         if content:
             self.note_content.insert(tk.END, content)
+        self.autosaver.track(self.current_note_id, content)
+
+    def get_content(self):
+        return self.note_content.get('1.0', tk.END).strip()
+
+    def on_content_modified(self, event):
+        """queues an autosave of the note on every edit"""
+        if not self.note_content.edit_modified():
+            return #the event from resetting the flag below
+        self.note_content.edit_modified(False)
+        if getattr(self, 'current_note_id', None):
+            self.autosaver.changed(self.current_note_id, self.get_content)
+
+    def on_search_changed(self, *args):
+        """searches once typing pauses, rather than on every keystroke"""
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(self.SEARCH_DELAY, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        self.load_notes()
 
     def save_note(self):
         """saves current note to database"""
@@ -1181,10 +1620,11 @@ class NotesPage(tk.Frame):
 
         index = self.notes_list.curselection()[0]
         note_id = self.note_map[index]
-        title = self.notes_list.get(index)
-        content = self.note_content.get('1.0', tk.END).strip()
+        title = self.note_titles[note_id]
+        content = self.get_content()
         
         if save_note_to_db(logged_in_user, title, content, note_id):
+            self.autosaver.track(note_id, content)
             messagebox.showinfo("Success", "Note saved successfully!")
         else:
             messagebox.showerror("Error", "Failed to save note.")
@@ -1196,10 +1636,11 @@ class NotesPage(tk.Frame):
             content = ""
             note_id = save_note_to_db(logged_in_user, title, content)
             if note_id:
+                self.clear_search()
                 self.load_notes()
                 #find and select the new note
                 for i in range(self.notes_list.size()):
-                    if self.notes_list.get(i) == title:
+                    if self.note_map[i] == note_id:
                         self.notes_list.selection_clear(0, tk.END)
                         self.notes_list.selection_set(i)
                         self.current_note_id = self.note_map[i]
@@ -1207,6 +1648,7 @@ class NotesPage(tk.Frame):
                         break
                 #clear content area
                 self.note_content.delete('1.0', tk.END)
+                self.autosaver.track(note_id, content)
             else:
                 messagebox.showerror("Error", "Failed to create new note.")
 
@@ -1217,7 +1659,7 @@ class NotesPage(tk.Frame):
             return
         
         if hasattr(self, 'current_note_id') and self.current_note_id:
-            old_title = self.notes_list.get(self.notes_list.curselection())
+            old_title = self.note_titles[self.current_note_id]
             new_title = simpledialog.askstring("Edit Title", "Enter new title:", initialvalue=old_title)
             
             if new_title and new_title != old_title:
@@ -1236,6 +1678,7 @@ class NotesPage(tk.Frame):
         
         if hasattr(self, 'current_note_id') and self.current_note_id:
             if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this note?"):
+                self.autosaver.forget(self.current_note_id)
                 if delete_note_from_db(self.current_note_id):
                     self.load_notes()
                 else:
@@ -1243,9 +1686,68 @@ class NotesPage(tk.Frame):
         else:
             messagebox.showerror("Error", "No note selected.")
 
+    def show_history(self):
+        """lists the selected note's saved versions - selecting one shows the note as it was
+        then, and Restore puts that version back in the editor (saved like any other edit)"""
+        if not getattr(self, 'current_note_id', None):
+            messagebox.showerror("Error", "No note selected.")
+            return
+        self.autosaver.save_now() #so the latest edits are in the history
+        note_id = self.current_note_id
+        revisions = get_note_revisions(logged_in_user, note_id)
+
+        history_dialog = tk.Toplevel(self)
+        history_dialog.title(f"History - {self.note_titles.get(note_id, '')}")
+        history_dialog.geometry("700x400")
+
+        versions_list = tk.Listbox(history_dialog, font=("Arial", 11), width=22)
+        versions_list.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=5)
+        restore_btn = tk.Button(history_dialog, text="Restore", bg="#333940", fg="#FFEB3B")
+        restore_btn.pack(side=tk.BOTTOM, pady=5)
+        preview = tk.Text(history_dialog, wrap=tk.WORD, font=("Arial", 11))
+        preview.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        for revision, saved_at in revisions:
+            versions_list.insert(tk.END, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(saved_at)))
+
+        def show_version(event):
+            if not versions_list.curselection():
+                return
+            saved_at = revisions[versions_list.curselection()[0]][1]
+            preview.config(state=tk.NORMAL)
+            preview.delete('1.0', tk.END)
+            preview.insert(tk.END, get_note_at(logged_in_user, note_id, saved_at) or "")
+            preview.config(state=tk.DISABLED)
+
+        def restore():
+            if not versions_list.curselection() or self.current_note_id != note_id:
+                return
+            self.note_content.delete('1.0', tk.END)
+            self.note_content.insert(tk.END, preview.get('1.0', tk.END).strip())
+            history_dialog.destroy()
+
+        versions_list.bind('<<ListboxSelect>>', show_version)
+        restore_btn.config(command=restore)
+        if revisions:
+            versions_list.selection_set(0)
+            show_version(None)
+
+    def clear_search(self):
+        self.search_var.set("")
+        #set() schedules a search - not needed, as the caller reloads the list itself
+        self.after_cancel(self.search_after_id)
+        self.search_after_id = None
+
     def go_back(self):
         self.master.go_back()
 
+    def destroy(self):
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        self.autosaver.save_now()
+        super().destroy()
+
 
 if __name__ == "__main__":
     app = CryptoTrackerApp()
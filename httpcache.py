@@ -0,0 +1,184 @@
+import sqlite3
+import threading
+import time
+import zlib
+import requests
+from requests.structures import CaseInsensitiveDict
+from database import ConnectionManager
+
+cache_path = "http_cache.db"
+
+MAX_CACHE_BYTES = 20 * 1024 * 1024 #size cap for stored bodies - least recently used are removed first
+#bumped when stored rows can't be kept - they are all removed on the next start.
+#1: urls were stored with their api keys
+CACHE_VERSION = 1
+
+
+class CachedResponse:
+    """a stored response and the validators needed to revalidate it"""
+    def __init__(self, url, body, content_type, etag, last_modified, stored_at):
+        self.url = url
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    def age(self):
+        return time.time() - self.stored_at
+
+    def can_revalidate(self):
+        return bool(self.etag or self.last_modified)
+
+    def conditional_headers(self):
+        """headers that ask the server to reply 304 if the response hasn't changed"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self, revalidated=False):
+        """rebuilds a requests.Response so callers can't tell it came from the cache.
+        revalidated marks a body reused after a 304 - unlike a plain hit, a request was sent for it"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response._content = self.body
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict({"Content-Type": self.content_type or "application/json"})
+        response.from_cache = True
+        response.revalidated = revalidated
+        return response
+
+
+class ResponseCache:
+    """on disk cache of GET responses, keyed by endpoint and params. bodies are stored
+    zlib compressed and the total size is capped with LRU eviction"""
+    def __init__(self, path=cache_path, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.__db = ConnectionManager(path)
+        self.__lock = threading.Lock()
+        self.__ready = False
+        self.hits = 0
+        self.revalidated = 0 #304 responses - cached body reused without downloading it again
+        self.misses = 0
+
+    def __connect(self):
+        connection = self.__db.connection()
+        if not self.__ready:
+            with self.__lock:
+                connection.executescript("""
+                    CREATE TABLE IF NOT EXISTS Responses (
+                        cacheKey TEXT NOT NULL UNIQUE,
+                        url TEXT NOT NULL,
+                        body BLOB NOT NULL,
+                        contentType TEXT,
+                        etag TEXT,
+                        lastModified TEXT,
+                        storedAt REAL NOT NULL,
+                        lastUsed REAL NOT NULL,
+                        size INTEGER NOT NULL,
+                        PRIMARY KEY(cacheKey)
+                    );
+                    CREATE INDEX IF NOT EXISTS ResponsesLastUsed ON Responses(lastUsed);
+                """)
+                if connection.execute("PRAGMA user_version").fetchone()[0] < CACHE_VERSION:
+                    #vacuum so the removed rows don't stay readable in free pages
+                    connection.executescript(f"""
+                        DELETE FROM Responses;
+                        PRAGMA user_version = {CACHE_VERSION};
+                        VACUUM;
+                    """)
+                self.__ready = True
+        return connection
+
+    @staticmethod
+    def make_key(client_name, request_key):
+        path, params = request_key
+        return f"{client_name}:{path}?" + "&".join(f"{name}={value}" for name, value in params)
+
+    @staticmethod
+    def __report_error(future):
+        if future.exception() is not None:
+            print(f"Response cache error: {future.exception()}")
+
+    def __write(self, func, *args):
+        """queues a write on the cache's writer thread without waiting for it - nothing
+        needs the result, so a slow commit never holds up a request"""
+        self.__connect()
+        self.__db.write(func, *args).add_done_callback(self.__report_error)
+
+    def get(self, key):
+        """returns the CachedResponse for key, or None"""
+        try:
+            cursor = self.__connect().cursor()
+            cursor.execute("""
+                SELECT url, body, contentType, etag, lastModified, storedAt
+                FROM Responses WHERE cacheKey = ?
+            """, (key,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            self.__write(lambda cursor: cursor.execute("UPDATE Responses SET lastUsed = ? WHERE cacheKey = ?",
+                                                       (time.time(), key)))
+            url, body, content_type, etag, last_modified, stored_at = row
+            return CachedResponse(url, zlib.decompress(body), content_type, etag, last_modified, stored_at)
+        except (sqlite3.Error, zlib.error) as e:
+            print(f"Response cache error: {e}")
+            return None
+
+    def store(self, key, url, response):
+        """stores a 200 response, then evicts least recently used entries if over the size cap.
+        url is the response's url with any api keys taken out - it is written to disk as it is"""
+        body = zlib.compress(response.content)
+        now = time.time()
+        row = (key, url, body, response.headers.get("Content-Type"), response.headers.get("ETag"),
+               response.headers.get("Last-Modified"), now, now, len(body))
+
+        def insert(cursor):
+            cursor.execute("""
+                INSERT OR REPLACE INTO Responses
+                (cacheKey, url, body, contentType, etag, lastModified, storedAt, lastUsed, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, row)
+            self.__evict(cursor)
+
+        self.__write(insert)
+
+    def touch(self, key):
+        """marks a revalidated (304) entry as fresh again"""
+        now = time.time()
+        self.__write(lambda cursor: cursor.execute(
+            "UPDATE Responses SET storedAt = ?, lastUsed = ? WHERE cacheKey = ?", (now, now, key)))
+
+    def __evict(self, cursor):
+        cursor.execute("SELECT COALESCE(SUM(size), 0) FROM Responses")
+        total = cursor.fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        cursor.execute("SELECT cacheKey, size FROM Responses ORDER BY lastUsed")
+        to_remove = []
+        for key, size in cursor.fetchall():
+            if total <= self.max_bytes:
+                break
+            to_remove.append((key,))
+            total -= size
+        cursor.executemany("DELETE FROM Responses WHERE cacheKey = ?", to_remove)
+
+    def clear(self):
+        self.__connect()
+        self.__db.write(lambda cursor: cursor.execute("DELETE FROM Responses")).result()
+
+    def close(self):
+        """finishes queued writes and closes the cache's connections (on exit)"""
+        self.__db.close_all()
+
+    def stats(self):
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+
+if __name__ == "__main__":
+    pass
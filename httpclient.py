@@ -0,0 +1,354 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (5, 15) #(connect, read) seconds - stops a hung socket blocking forever
+MAX_RATE_LIMIT_WAIT = 30 #longest a request will queue for a rate limit token (seconds)
+MAX_RETRIES = 2 #extra attempts after a connection error / timeout / 5xx response
+RETRY_STATUSES = (500, 502, 503, 504)
+BACKOFF_BASE = 0.5 #seconds - doubled each attempt
+BACKOFF_CAP = 8
+
+
+class RateLimitTimeout(requests.RequestException):
+    """raised when a request would have to wait too long for the rate limiter"""
+
+
+class APIError(Exception):
+    """base class for errors from a provider. not a RequestException, so it isn't
+    swallowed by the per key retry loops and fails the whole call straight away"""
+    def __init__(self, provider, message):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+
+
+class CircuitOpenError(APIError):
+    """raised instead of sending a request while a provider's circuit is open"""
+    def __init__(self, provider, retry_in):
+        super().__init__(provider, f"service unavailable, retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class APIUnavailableError(APIError):
+    """raised when every api key / attempt for a request failed"""
+    def __init__(self, provider, message="request failed with every API key"):
+        super().__init__(provider, message)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """exponential backoff with full jitter - random so clients don't retry in step"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """stops requests to a provider after repeated failures. while open, requests fail
+    straight away. after reset_timeout one probe request is let through - if it works
+    the circuit closes again, otherwise it re-opens"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.__failures = 0
+        self.__opened_at = 0.0
+        self.__probing = False
+        self.__lock = threading.Lock()
+
+    def before_request(self):
+        """raises CircuitOpenError if the request shouldn't be sent"""
+        with self.__lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                retry_in = self.__opened_at + self.reset_timeout - now
+                if retry_in > 0:
+                    raise CircuitOpenError(self.name, retry_in)
+                self.state = self.HALF_OPEN
+            if self.__probing: #only one probe at a time
+                raise CircuitOpenError(self.name, 0)
+            self.__probing = True
+
+    def check(self):
+        """raises CircuitOpenError if before_request would, without taking the probe -
+        so a request can fail fast before waiting on anything else (e.g. the rate limiter)"""
+        with self.__lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                retry_in = self.__opened_at + self.reset_timeout - time.monotonic()
+                if retry_in > 0:
+                    raise CircuitOpenError(self.name, retry_in)
+            if self.__probing:
+                raise CircuitOpenError(self.name, 0)
+
+    def record_success(self):
+        with self.__lock:
+            self.state = self.CLOSED
+            self.__failures = 0
+            self.__probing = False
+
+    def record_failure(self):
+        with self.__lock:
+            self.__failures += 1
+            if self.state == self.HALF_OPEN or self.__failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.__opened_at = time.monotonic()
+            self.__probing = False
+
+    def is_open(self):
+        with self.__lock:
+            return self.state == self.OPEN and time.monotonic() - self.__opened_at < self.reset_timeout
+
+
+class TokenBucket:
+    """token bucket rate limiter - allows bursts of up to capacity requests,
+    then rate requests per second"""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.__tokens = float(capacity)
+        self.__last_refill = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def __refill(self, now):
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__last_refill) * self.rate)
+        self.__last_refill = now
+
+    def acquire(self, max_wait=MAX_RATE_LIMIT_WAIT):
+        """blocks until a token is available. raises RateLimitTimeout if that would take longer than max_wait"""
+        with self.__lock:
+            now = time.monotonic()
+            self.__refill(now)
+            wait = (1 - self.__tokens) / self.rate if self.__tokens < 1 else 0.0
+            if wait > max_wait:
+                raise RateLimitTimeout(f"rate limit wait of {wait:.1f}s is too long")
+            #token is reserved now (can go negative) so waiting threads queue up fairly
+            self.__tokens -= 1
+        if wait:
+            time.sleep(wait)
+
+    def available(self):
+        with self.__lock:
+            self.__refill(time.monotonic())
+            return self.__tokens
+
+
+class SingleFlight:
+    """coalesces identical concurrent calls - while a call for a key is running,
+    other callers with the same key wait for it and share its result"""
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.__calls = {}
+        self.__lock = threading.Lock()
+        self.coalesced = 0 #number of calls that shared another call's result
+
+    def do(self, key, func, *args, **kwargs):
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.Call()
+                self.__calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call.done.set()
+        return call.result
+
+
+class RequestStats:
+    """thread safe latency / status counters for one client"""
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0 #requests that never got a response (timeouts, connection errors)
+        self.status_counts = {}
+        self.total_time = 0.0
+        self.min_time = None
+        self.max_time = None
+        self.last_time = None
+
+    def record(self, elapsed, status_code=None):
+        with self.__lock:
+            self.requests += 1
+            self.total_time += elapsed
+            self.last_time = elapsed
+            self.min_time = elapsed if self.min_time is None else min(self.min_time, elapsed)
+            self.max_time = elapsed if self.max_time is None else max(self.max_time, elapsed)
+            if status_code is None:
+                self.failures += 1
+            else:
+                self.status_counts[status_code] = self.status_counts.get(status_code, 0) + 1
+
+    def summary(self):
+        """returns stats as a dict, times are in milliseconds"""
+        with self.__lock:
+            def ms(seconds):
+                return round(seconds * 1000, 1) if seconds is not None else None
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "status_counts": dict(self.status_counts),
+                "avg_ms": ms(self.total_time / self.requests) if self.requests else None,
+                "min_ms": ms(self.min_time),
+                "max_ms": ms(self.max_time),
+                "last_ms": ms(self.last_time),
+            }
+
+
+class APIClient:
+    """pooled, keep-alive http client for a single api provider.
+    one instance is shared by every call to that provider so connections get reused"""
+    def __init__(self, name, base_url, pool_size=10, timeout=DEFAULT_TIMEOUT, headers=None,
+                 rate_limiter=None, key_params=(), cache=None, cache_policy=None, max_retries=MAX_RETRIES):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.circuit_breaker = CircuitBreaker(name)
+        self.rate_limiter = rate_limiter
+        self.cache = cache #ResponseCache shared between clients
+        self.cache_policy = cache_policy or {} #path -> seconds a cached response is fresh for
+        self.key_params = set(key_params) #param names holding api keys - ignored when coalescing
+        self.flights = SingleFlight()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        if headers:
+            self.session.headers.update(headers)
+
+        self.stats = RequestStats()
+
+    def get(self, path, params=None, headers=None, timeout=None):
+        """sends GET request to base_url + path and returns the response.
+        paths with a cache policy are served from the response cache while fresh, and revalidated
+        with If-None-Match / If-Modified-Since once stale. if the provider is down a stale cached
+        response is returned instead of an error.
+        raises requests.RequestException if no response is received, or CircuitOpenError"""
+        max_age = self.cache_policy.get(path) if self.cache else None
+        if max_age is None:
+            return self.__send(path, params, headers, timeout)
+
+        key = self.cache.make_key(self.name, self.request_key(path, params))
+        cached = self.cache.get(key)
+        if cached and cached.age() <= max_age:
+            self.cache.hits += 1
+            return cached.to_response()
+        if cached and cached.can_revalidate():
+            headers = {**(headers or {}), **cached.conditional_headers()}
+
+        try:
+            response = self.__send(path, params, headers, timeout)
+        except (requests.RequestException, CircuitOpenError):
+            if cached: #outage - stale data is better than none
+                self.cache.hits += 1
+                return cached.to_response()
+            raise
+        if response.status_code in RETRY_STATUSES and cached:
+            self.cache.hits += 1
+            return cached.to_response()
+        if response.status_code == 304 and cached:
+            self.cache.revalidated += 1
+            self.cache.touch(key)
+            return cached.to_response(revalidated=True)
+        self.cache.misses += 1
+        if response.status_code == 200:
+            self.cache.store(key, self.strip_keys(response.url), response)
+        return response
+
+    def __send(self, path, params, headers, timeout):
+        """sends the request, retrying connection errors, timeouts and 5xx responses with
+        jittered exponential backoff. every attempt goes through the circuit breaker - checked
+        before waiting for a rate limit token (so an open circuit fails fast without using one),
+        and again after, as the circuit may have opened during the wait"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                self.circuit_breaker.check()
+                self.rate_limiter.acquire()
+            self.circuit_breaker.before_request()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers,
+                                            timeout=timeout or self.timeout)
+            except requests.RequestException:
+                self.stats.record(time.perf_counter() - start)
+                self.circuit_breaker.record_failure()
+                if attempt == self.max_retries or self.circuit_breaker.is_open():
+                    raise
+            except BaseException:
+                #anything else still has to finish the request in the breaker - a probe left
+                #unfinished would make it reject every request from then on
+                self.stats.record(time.perf_counter() - start)
+                self.circuit_breaker.record_failure()
+                raise
+            else:
+                self.stats.record(time.perf_counter() - start, response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    self.circuit_breaker.record_success()
+                    return response
+                self.circuit_breaker.record_failure()
+                if attempt == self.max_retries or self.circuit_breaker.is_open():
+                    return response #no point retrying once the circuit has opened
+            time.sleep(backoff_delay(attempt))
+
+    def request_key(self, path, params=None):
+        """identifies a request by endpoint and params (without api keys)"""
+        items = params.items() if isinstance(params, dict) else (params or [])
+        return (path, tuple(sorted((str(name), str(value)) for name, value in items
+                                   if name not in self.key_params)))
+
+    def strip_keys(self, url):
+        """url without its api key params, so it can be stored or shown"""
+        parts = urlsplit(url)
+        query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                 if name not in self.key_params]
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def coalesce(self, path, params, func, *args, **kwargs):
+        """runs func(*args, **kwargs), sharing the result with any identical request
+        (same endpoint and params) already in flight from the same function. calls made by
+        different functions aren't shared - each may turn the response into a different result"""
+        key = (func.__module__, func.__qualname__, *self.request_key(path, params))
+        return self.flights.do(key, func, *args, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+DEFAULT_COOLDOWN = 60 #seconds a throttled key is rested for if there is no Retry-After header
+INVALID_KEY_COOLDOWN = 60 * 60 #401 means the key is wrong/expired so it is rested for much longer
+
+
+def parse_retry_after(value):
+    """returns seconds to wait from a Retry-After header (seconds or http date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class APIKey:
+    """one api key and its usage/health"""
+    def __init__(self, key):
+        self.key = key
+        self.requests = 0
+        self.successes = 0
+        self.throttled = 0 #number of 429 responses
+        self.rejected = 0 #number of 401/403 responses
+        self.errors = 0 #requests with no response
+        self.cooldown_until = 0.0
+        self.last_status = None
+        self.recent = deque() #timestamps of requests in the last minute
+
+    def is_available(self, now):
+        return now >= self.cooldown_until
+
+    def summary(self, now):
+        while self.recent and now - self.recent[0] > 60:
+            self.recent.popleft()
+        return {
+            "key": f"...{self.key[-4:]}", #never show the whole key
+            "requests": self.requests,
+            "successes": self.successes,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "requests_last_minute": len(self.recent),
+            "last_status": self.last_status,
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 1),
+        }
+
+
+class KeyPool:
+    """api keys for one provider, loaded from file once and handed out round robin.
+    keys that get throttled or rejected are put in cooldown and skipped"""
+    def __init__(self, file_path, reader):
+        self.file_path = file_path
+        self.__reader = reader #function that reads the list of keys from a file
+        self.__keys = None #loaded on first use
+        self.__next_index = 0
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        if self.__keys is None:
+            self.__keys = [APIKey(key) for key in (self.__reader(self.file_path) or [])]
+
+    def reload(self):
+        """re-reads keys from file (e.g. after new keys are added)"""
+        with self.__lock:
+            self.__keys = None
+            self.__load()
+
+    def keys_to_try(self):
+        """returns available keys in rotation order, starting from the next key in the round robin.
+        each call moves the starting point on by one so load is spread over every key"""
+        now = time.time()
+        with self.__lock:
+            self.__load()
+            if not self.__keys:
+                return []
+            start = self.__next_index % len(self.__keys)
+            self.__next_index = start + 1
+            rotated = self.__keys[start:] + self.__keys[:start]
+            return [api_key.key for api_key in rotated if api_key.is_available(now)]
+
+    def available_count(self):
+        """number of keys not in cooldown"""
+        now = time.time()
+        with self.__lock:
+            self.__load()
+            return sum(api_key.is_available(now) for api_key in self.__keys)
+
+    def __find(self, key):
+        for api_key in self.__keys or []:
+            if api_key.key == key:
+                return api_key
+        return None
+
+    def report(self, key, response=None):
+        """records the result of a request made with key. response is None if no response was received"""
+        now = time.time()
+        with self.__lock:
+            api_key = self.__find(key)
+            if api_key is None:
+                return
+            api_key.requests += 1
+            api_key.recent.append(now)
+            if response is None:
+                api_key.errors += 1
+                return
+
+            status = response.status_code
+            api_key.last_status = status
+            if status == 429:
+                api_key.throttled += 1
+                wait = parse_retry_after(response.headers.get("Retry-After"))
+                api_key.cooldown_until = now + (wait if wait is not None else DEFAULT_COOLDOWN)
+            elif status in (401, 403):
+                api_key.rejected += 1
+                wait = parse_retry_after(response.headers.get("Retry-After"))
+                api_key.cooldown_until = now + (wait if wait is not None else INVALID_KEY_COOLDOWN)
+            elif status < 400:
+                api_key.successes += 1
+
+    def stats(self):
+        """returns usage and health of each key for monitoring"""
+        now = time.time()
+        with self.__lock:
+            self.__load()
+            return [api_key.summary(now) for api_key in self.__keys]
+
+
+if __name__ == "__main__":
+    pass
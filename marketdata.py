@@ -0,0 +1,60 @@
+import json
+import numpy as np
+
+try: #optional dependency (pip install orjson) - much faster parser, the stdlib one is used otherwise
+    import orjson
+    loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    loads = json.loads
+    JSON_BACKEND = "json"
+
+#the only fields the app uses from /coins/markets, in the order they are stored in each coin's tuple
+#(indexed the same as the lists used before - values[2] is still the price). a plain tuple is built
+#as fast as a list and is a little smaller - most of the speed up comes from the orjson backend
+MARKET_FIELDS = ("name", "symbol", "price", "change_1h", "change_24h", "change_7d", "market_cap", "rank")
+
+
+def decode_markets(content):
+    """decodes a /coins/markets response body (bytes or str) into {coin id: tuple of MARKET_FIELDS}.
+    the other ~25 fields per coin are dropped as soon as the payload is parsed"""
+    records = {}
+    for coin in loads(content):
+        records[coin['id']] = (
+            coin['name'],
+            coin['symbol'],
+            coin['current_price'],
+            coin.get('price_change_percentage_1h_in_currency') or 0, #missing or null
+            coin.get('price_change_percentage_24h_in_currency') or 0,
+            coin.get('price_change_percentage_7d_in_currency') or 0,
+            coin['market_cap'],
+            coin['market_cap_rank']
+        )
+    return records
+
+
+def align_column(timestamps, column):
+    """values from a [[ms, value], ...] column at each of timestamps (nan where it has no point)"""
+    if not len(column):
+        return np.full(len(timestamps), np.nan)
+    column_times = (column[:, 0] // 1000).astype(np.int64)
+    if len(column_times) == len(timestamps) and (column_times == timestamps).all():
+        return column[:, 1]
+    index = np.searchsorted(column_times, timestamps).clip(0, len(column_times) - 1)
+    return np.where(column_times[index] == timestamps, column[index, 1], np.nan)
+
+
+def decode_market_chart(content):
+    """decodes a /coins/{id}/market_chart response body into numpy columns
+    (timestamps in unix seconds, prices, volumes, market caps), oldest first"""
+    data = loads(content)
+    columns = [np.array(data.get(name) or [], dtype=np.float64).reshape(-1, 2)
+               for name in ("prices", "total_volumes", "market_caps")]
+    prices = columns[0][~np.isnan(columns[0][:, 1])] #null prices are dropped
+    timestamps = (prices[:, 0] // 1000).astype(np.int64)
+    return (timestamps, prices[:, 1], align_column(timestamps, columns[1]),
+            align_column(timestamps, columns[2]))
+
+
+if __name__ == "__main__":
+    pass
@@ -1,6 +1,7 @@
 import math
 import os
 import hashlib
+import hmac
 
 def round_to_sf(x, sf=3):
     if x == 0:
@@ -8,16 +9,71 @@ def round_to_sf(x, sf=3):
     return round(x, -int(math.floor(math.log10(abs(x)))) + (sf - 1))
 
 
-def hash_password(password):
-    """hashes passsword with salt into 32 bytes - as a hex string"""
-    salt = os.urandom(32) #generates random salt for password (32 bytes)
-    iterations = 100_000 #number of iterations for PBKDF2 algorithm (more means more security but longer time)
-    key_length = 32 #length of hashed password in bytes
-    
-    #hashes password with PBKDF2 using sha256 within
-    password_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, key_length) 
-        #password.encode() converts string to bytes
-    return salt.hex() + password_hash.hex() #combines salt and hash, converting both to hexadecimal strings
+#stored password hashes say how they were made, so the cost can be raised without breaking old ones:
+#"scrypt$n$r$p$salt$hash" or "pbkdf2_sha256$iterations$salt$hash" (salt and hash as hex).
+#a hash made with anything but the current settings is replaced the next time the user logs in
+PASSWORD_ALGORITHM = "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256" #scrypt needs OpenSSL 1.1+
+SCRYPT_N = 2 ** 17 #cpu/memory cost - uses 128 * n * r bytes (128 MiB). owasp minimum for r=8, p=1
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600_000
+SALT_LENGTH = 32 #bytes
+KEY_LENGTH = 32 #length of hashed password in bytes
+LEGACY_ITERATIONS = 100_000 #hashes from before the algorithm was stored - bare salt + hash hex, pbkdf2
+
+
+def derive_key(password, salt, algorithm, params):
+    """runs the key derivation function - slow on purpose, so call from a worker thread"""
+    if algorithm == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r, dklen=KEY_LENGTH)
+    if algorithm == "pbkdf2_sha256":
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, KEY_LENGTH)
+    raise ValueError(f"unknown password hash algorithm: {algorithm}")
+
+
+def current_params(algorithm=PASSWORD_ALGORITHM):
+    return (SCRYPT_N, SCRYPT_R, SCRYPT_P) if algorithm == "scrypt" else (PBKDF2_ITERATIONS,)
+
+
+def hash_password(password, algorithm=PASSWORD_ALGORITHM):
+    """hashes passsword with a random salt, returning it in the self describing format above"""
+    salt = os.urandom(SALT_LENGTH) #generates random salt for password
+    params = current_params(algorithm)
+    password_hash = derive_key(password, salt, algorithm, params)
+    return "$".join([algorithm, *map(str, params), salt.hex(), password_hash.hex()])
+
+
+def parse_password_hash(stored):
+    """returns (algorithm, params, salt, hash) of a stored hash. raises ValueError if it isn't valid"""
+    if "$" not in stored: #legacy format - first 64 chars (32 bytes) are the salt
+        return "pbkdf2_sha256", (LEGACY_ITERATIONS,), bytes.fromhex(stored[:64]), bytes.fromhex(stored[64:])
+    algorithm, *params, salt, password_hash = stored.split("$")
+    params = tuple(int(param) for param in params)
+    if len(params) != len(current_params(algorithm)):
+        raise ValueError(f"wrong number of parameters for {algorithm}")
+    return algorithm, params, bytes.fromhex(salt), bytes.fromhex(password_hash)
+
+
+def check_password(password, stored):
+    """whether password matches a stored hash (in any format ever used)"""
+    try:
+        algorithm, params, salt, stored_hash = parse_password_hash(stored)
+        new_hash = derive_key(password, salt, algorithm, params)
+    except ValueError:
+        return False
+    return hmac.compare_digest(new_hash, stored_hash)
+
+
+def needs_rehash(stored):
+    """whether a stored hash was made with other settings than the current ones"""
+    try:
+        algorithm, params, salt, _ = parse_password_hash(stored)
+    except ValueError:
+        return True
+    return algorithm != PASSWORD_ALGORITHM or params != current_params() or len(salt) != SALT_LENGTH
 
 
 def merge_sort(arr, key_function=None):
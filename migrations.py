@@ -0,0 +1,353 @@
+import sqlite3
+from database import db
+
+#each migration is (version, description, statements). a database's PRAGMA user_version is the
+#last migration applied to it, so on launch only newer migrations are run - or none at all.
+#never edit a migration that has been released - add a new one instead
+MIGRATIONS = [
+    (1, "initial schema", """
+    CREATE TABLE IF NOT EXISTS User (
+        username VARCHAR NOT NULL UNIQUE,
+        hashedPassword TEXT NOT NULL,
+        PRIMARY KEY(username)
+    );
+
+    CREATE TABLE IF NOT EXISTS NotesData (
+        noteId INTEGER PRIMARY KEY AUTOINCREMENT,
+        title VARCHAR NOT NULL,
+        content TEXT, 
+        noteOwner VARCHAR NOT NULL,
+        FOREIGN KEY(noteOwner) REFERENCES User(username)
+    );
+
+    CREATE TABLE IF NOT EXISTS TopcoinList (
+        listOwner VARCHAR NOT NULL,
+        coinTicker VARCHAR NOT NULL,
+        PRIMARY KEY(listOwner, coinTicker),
+        FOREIGN KEY(listOwner) REFERENCES User(username),
+        FOREIGN KEY(coinTicker) REFERENCES Coin(coinTicker)
+    );
+
+    CREATE TABLE IF NOT EXISTS Transactions (
+        transactionId INTEGER PRIMARY KEY AUTOINCREMENT,
+        value FLOAT,
+        quantity FLOAT, 
+        portfolioOwner VARCHAR NOT NULL,
+        coinTicker VARCHAR NOT NULL,
+        FOREIGN KEY(portfolioOwner) REFERENCES User(username),
+        FOREIGN KEY(coinTicker) REFERENCES Coin(coinTicker)
+    );
+
+    CREATE TABLE IF NOT EXISTS Coin (
+        coinTicker VARCHAR NOT NULL UNIQUE,
+        coinName VARCHAR NOT NULL,
+        PRIMARY KEY(coinTicker)
+    );
+
+    CREATE TABLE IF NOT EXISTS ExchangeRates (
+        currency VARCHAR NOT NULL UNIQUE,
+        rate FLOAT NOT NULL,
+        baseCurrency VARCHAR NOT NULL,
+        fetchedAt INTEGER NOT NULL,
+        PRIMARY KEY(currency)
+    );
+
+    CREATE TABLE IF NOT EXISTS CoinCatalog (
+        coinId VARCHAR NOT NULL UNIQUE,
+        symbol VARCHAR NOT NULL,
+        name VARCHAR NOT NULL,
+        searchName VARCHAR NOT NULL,
+        PRIMARY KEY(coinId)
+    );
+
+    CREATE INDEX IF NOT EXISTS CoinCatalogSymbol ON CoinCatalog(symbol);
+
+    CREATE INDEX IF NOT EXISTS CoinCatalogSearchName ON CoinCatalog(searchName);
+
+    CREATE TABLE IF NOT EXISTS SyncState (
+        name VARCHAR NOT NULL UNIQUE,
+        syncedAt INTEGER NOT NULL,
+        PRIMARY KEY(name)
+    );
+
+    CREATE TABLE IF NOT EXISTS NewsPosts (
+        postId INTEGER NOT NULL UNIQUE,
+        title VARCHAR NOT NULL,
+        url VARCHAR NOT NULL,
+        ticker VARCHAR,
+        publishedAt VARCHAR NOT NULL,
+        page INTEGER NOT NULL,
+        fetchedAt INTEGER NOT NULL,
+        PRIMARY KEY(postId)
+    );
+
+    CREATE INDEX IF NOT EXISTS NewsPostsPublishedAt ON NewsPosts(publishedAt);
+    """),
+
+    (2, "indexes for per user lookups", """
+    CREATE INDEX IF NOT EXISTS TransactionsOwner ON Transactions(portfolioOwner, coinTicker, value, quantity);
+
+    CREATE INDEX IF NOT EXISTS NotesDataOwner ON NotesData(noteOwner, noteId, title);
+
+    CREATE INDEX IF NOT EXISTS TopcoinListTicker ON TopcoinList(coinTicker);
+    """),
+
+    #running totals per (owner, coin), kept up to date by triggers on every write to Transactions
+    (3, "positions table maintained by triggers", """
+    CREATE TABLE IF NOT EXISTS Positions (
+        positionOwner VARCHAR NOT NULL,
+        coinTicker VARCHAR NOT NULL,
+        totalValue FLOAT NOT NULL,
+        quantity FLOAT NOT NULL,
+        transactionCount INTEGER NOT NULL,
+        PRIMARY KEY(positionOwner, coinTicker),
+        FOREIGN KEY(positionOwner) REFERENCES User(username),
+        FOREIGN KEY(coinTicker) REFERENCES Coin(coinTicker)
+    ) WITHOUT ROWID;
+
+    INSERT OR REPLACE INTO Positions (positionOwner, coinTicker, totalValue, quantity, transactionCount)
+    SELECT portfolioOwner, coinTicker, COALESCE(SUM(value), 0), COALESCE(SUM(quantity), 0), COUNT(*)
+    FROM Transactions
+    GROUP BY portfolioOwner, coinTicker;
+
+    CREATE TRIGGER IF NOT EXISTS TransactionsInsertPosition AFTER INSERT ON Transactions
+    BEGIN
+        INSERT INTO Positions (positionOwner, coinTicker, totalValue, quantity, transactionCount)
+        VALUES (NEW.portfolioOwner, NEW.coinTicker, COALESCE(NEW.value, 0), COALESCE(NEW.quantity, 0), 1)
+        ON CONFLICT(positionOwner, coinTicker) DO UPDATE SET
+            totalValue = totalValue + excluded.totalValue,
+            quantity = quantity + excluded.quantity,
+            transactionCount = transactionCount + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS TransactionsDeletePosition AFTER DELETE ON Transactions
+    BEGIN
+        UPDATE Positions SET
+            totalValue = totalValue - COALESCE(OLD.value, 0),
+            quantity = quantity - COALESCE(OLD.quantity, 0),
+            transactionCount = transactionCount - 1
+        WHERE positionOwner = OLD.portfolioOwner AND coinTicker = OLD.coinTicker;
+        DELETE FROM Positions
+        WHERE positionOwner = OLD.portfolioOwner AND coinTicker = OLD.coinTicker AND transactionCount <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS TransactionsUpdatePosition AFTER UPDATE OF value, quantity, portfolioOwner, coinTicker
+    ON Transactions
+    BEGIN
+        UPDATE Positions SET
+            totalValue = totalValue - COALESCE(OLD.value, 0),
+            quantity = quantity - COALESCE(OLD.quantity, 0),
+            transactionCount = transactionCount - 1
+        WHERE positionOwner = OLD.portfolioOwner AND coinTicker = OLD.coinTicker;
+        DELETE FROM Positions
+        WHERE positionOwner = OLD.portfolioOwner AND coinTicker = OLD.coinTicker AND transactionCount <= 0;
+        INSERT INTO Positions (positionOwner, coinTicker, totalValue, quantity, transactionCount)
+        VALUES (NEW.portfolioOwner, NEW.coinTicker, COALESCE(NEW.value, 0), COALESCE(NEW.quantity, 0), 1)
+        ON CONFLICT(positionOwner, coinTicker) DO UPDATE SET
+            totalValue = totalValue + excluded.totalValue,
+            quantity = quantity + excluded.quantity,
+            transactionCount = transactionCount + 1;
+    END;
+    """),
+
+    #full text index of note titles and contents. external content - the text is only stored in
+    #NotesData, the index holds the terms. prefix indexes make search-as-you-type prefix queries fast
+    (4, "full text search over notes", """
+    CREATE VIRTUAL TABLE IF NOT EXISTS NotesSearch USING fts5(
+        title, content,
+        content='NotesData', content_rowid='noteId',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+
+    INSERT INTO NotesSearch(NotesSearch) VALUES ('rebuild');
+
+    CREATE TRIGGER IF NOT EXISTS NotesDataInsertSearch AFTER INSERT ON NotesData
+    BEGIN
+        INSERT INTO NotesSearch (rowid, title, content) VALUES (NEW.noteId, NEW.title, NEW.content);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS NotesDataDeleteSearch AFTER DELETE ON NotesData
+    BEGIN
+        INSERT INTO NotesSearch (NotesSearch, rowid, title, content) VALUES ('delete', OLD.noteId, OLD.title, OLD.content);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS NotesDataUpdateSearch AFTER UPDATE OF title, content ON NotesData
+    BEGIN
+        INSERT INTO NotesSearch (NotesSearch, rowid, title, content) VALUES ('delete', OLD.noteId, OLD.title, OLD.content);
+        INSERT INTO NotesSearch (rowid, title, content) VALUES (NEW.noteId, NEW.title, NEW.content);
+    END;
+    """),
+
+    #long notes are now stored compressed (see notestorage), which sql can't read - so the index keeps
+    #its own copy of each note's plain text instead of reading NotesData. the triggers are plain sql
+    #(any connection, e.g. the sqlite3 shell, can write NotesData) and leave a compressed note's
+    #content out - the app writes its text to the index (sqlcode.index_note_text).
+    #nothing is compressed before this migration, so the index is filled straight from NotesData
+    (5, "search index over compressed notes", """
+    DROP TRIGGER IF EXISTS NotesDataInsertSearch;
+
+    DROP TRIGGER IF EXISTS NotesDataDeleteSearch;
+
+    DROP TRIGGER IF EXISTS NotesDataUpdateSearch;
+
+    DROP TABLE IF EXISTS NotesSearch;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS NotesSearch USING fts5(
+        title, content,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+
+    INSERT INTO NotesSearch (rowid, title, content) SELECT noteId, title, content FROM NotesData;
+
+    CREATE TRIGGER IF NOT EXISTS NotesDataInsertSearch AFTER INSERT ON NotesData
+    BEGIN
+        INSERT INTO NotesSearch (rowid, title, content)
+        VALUES (NEW.noteId, NEW.title, CASE WHEN typeof(NEW.content) = 'blob' THEN NULL ELSE NEW.content END);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS NotesDataDeleteSearch AFTER DELETE ON NotesData
+    BEGIN
+        DELETE FROM NotesSearch WHERE rowid = OLD.noteId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS NotesDataUpdateTitleSearch AFTER UPDATE OF title ON NotesData
+    BEGIN
+        UPDATE NotesSearch SET title = NEW.title WHERE rowid = NEW.noteId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS NotesDataUpdateContentSearch AFTER UPDATE OF content ON NotesData
+    WHEN OLD.content IS NOT NEW.content
+    BEGIN
+        UPDATE NotesSearch SET content = CASE WHEN typeof(NEW.content) = 'blob' THEN NULL ELSE NEW.content END
+        WHERE rowid = NEW.noteId;
+    END;
+    """),
+
+    #every saved version of a note's content. a revision is either a full snapshot (baseRevision is
+    #itself) or a delta against the revision before it, with baseRevision the snapshot its chain
+    #starts from (see notestorage). existing notes start with their current content as a snapshot
+    (6, "note revision history", """
+    CREATE TABLE IF NOT EXISTS NoteRevisions (
+        noteId INTEGER NOT NULL,
+        revision INTEGER NOT NULL,
+        savedAt REAL NOT NULL,
+        baseRevision INTEGER NOT NULL,
+        data BLOB,
+        PRIMARY KEY(noteId, revision),
+        FOREIGN KEY(noteId) REFERENCES NotesData(noteId) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS NoteRevisionsSavedAt ON NoteRevisions(noteId, savedAt, revision, baseRevision);
+
+    INSERT INTO NoteRevisions (noteId, revision, savedAt, baseRevision, data)
+    SELECT noteId, 1, CAST(strftime('%s', 'now') AS REAL), 1, content FROM NotesData;
+    """),
+
+    #unix time each transaction was made. unknown (NULL) for transactions added before this -
+    #they count as held from the start of any history. the owner index now covers the ledger query
+    (7, "transaction execution times", """
+    ALTER TABLE Transactions ADD COLUMN executedAt INTEGER;
+
+    DROP INDEX IF EXISTS TransactionsOwner;
+
+    CREATE INDEX IF NOT EXISTS TransactionsOwnerTime ON Transactions(portfolioOwner, coinTicker, executedAt, quantity, value);
+    """),
+
+    #fingerprint of the csv row a transaction was imported from (trade id or row hash, see csvimport),
+    #so importing a file again skips what is already in. NULL for transactions added in the app
+    (8, "imported transaction fingerprints", """
+    ALTER TABLE Transactions ADD COLUMN importId TEXT;
+
+    CREATE UNIQUE INDEX IF NOT EXISTS TransactionsImportId ON Transactions(portfolioOwner, importId);
+    """),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def split_statements(sql):
+    """splits a migration into statements. a trigger body's statements stay with their CREATE TRIGGER"""
+    statements = []
+    current = ""
+    for part in sql.split(";"):
+        current += part
+        if sqlite3.complete_statement(current + ";"):
+            if current.strip():
+                statements.append(current.strip())
+            current = ""
+        else:
+            current += ";"
+    if current.strip():
+        statements.append(current.strip())
+    return statements
+
+
+def get_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(manager=db):
+    """brings the database up to LATEST_VERSION. each migration runs in its own transaction,
+    together with the user_version update, so a failed migration leaves nothing half applied.
+    returns list of versions applied (empty if the schema was already current)"""
+    if get_version(manager.cursor()) >= LATEST_VERSION:
+        return []
+
+    applied = []
+    for version, description, sql in MIGRATIONS:
+        with manager.transaction() as cursor:
+            if get_version(cursor) >= version: #checked inside the transaction in case another thread migrated
+                continue
+            for statement in split_statements(sql):
+                cursor.execute(statement)
+            cursor.execute(f"PRAGMA user_version = {version}")
+        applied.append(version)
+    return applied
+
+
+#the per user queries (fetch_transactions, get_position, get_notes_list, get_note_at, get_ledger,
+#get_top_coins and the csv import's duplicate check), with the covering index each one should be answered from (None if a primary key
+#search is enough).
+#TopcoinListTicker is for joins from the Coin side and foreign key checks on Coin
+INDEXED_QUERIES = [
+    ("SELECT coinTicker, totalValue, quantity FROM Positions WHERE positionOwner = ?", None),
+    ("SELECT totalValue, quantity FROM Positions WHERE positionOwner = ? AND coinTicker = ?", None),
+    ("SELECT noteId, title FROM NotesData WHERE noteOwner = ? ORDER BY noteId", "NotesDataOwner"),
+    ("""SELECT revision, baseRevision FROM NoteRevisions WHERE noteId = ? AND savedAt <= ?
+        ORDER BY savedAt DESC, revision DESC LIMIT 1""", "NoteRevisionsSavedAt"),
+    ("""SELECT Transactions.coinTicker, Coin.coinName, executedAt, quantity, value FROM Transactions
+        INNER JOIN Coin ON Coin.coinTicker = Transactions.coinTicker WHERE portfolioOwner = ?""", "TransactionsOwnerTime"),
+    ("SELECT importId FROM Transactions WHERE portfolioOwner = ? AND importId IN (?, ?)", "TransactionsImportId"),
+    ("""SELECT Coin.coinName FROM Coin INNER JOIN TopcoinList ON Coin.coinTicker = TopcoinList.coinTicker
+        WHERE listOwner = ?""", None),
+]
+
+
+def check_query_plans(manager=db):
+    """returns a list of problems - queries whose plan doesn't use their covering index,
+    or that scan a whole table / sort with a temporary b-tree. empty if every plan is fine"""
+    problems = []
+    cursor = manager.cursor()
+    for query, index in INDEXED_QUERIES:
+        cursor.execute("EXPLAIN QUERY PLAN " + query, ("",) * query.count("?"))
+        plan = [row[3] for row in cursor.fetchall()]
+        if index and not any(f"COVERING INDEX {index}" in step for step in plan):
+            problems.append(f"{index} not used: {plan}")
+        problems.extend(f"{step}: {' '.join(query.split())}" for step in plan
+                        if step.startswith("SCAN") or "TEMP B-TREE" in step)
+    return problems
+
+
+if __name__ == "__main__":
+    #migrates a fresh in memory database and checks the indexes are used
+    from database import ConnectionManager
+    test_db = ConnectionManager(":memory:")
+    print("applied migrations:", migrate(test_db))
+    print("applied again:", migrate(test_db))
+    problems = check_query_plans(test_db)
+    for problem in problems:
+        print("FAIL", problem)
+    if problems:
+        raise SystemExit(1)
+    print("query plans OK")
@@ -0,0 +1,84 @@
+import sqlite3
+import time
+from apifunctions import get_news_page
+from database import db
+
+MAX_CACHED_POSTS = 500 #older stories are removed from the database
+
+
+def save_posts(posts, page, fetched_at):
+    """caches a fetched page of stories, replacing any copies already stored"""
+    def save(cursor):
+        cursor.executemany("""
+            INSERT OR REPLACE INTO NewsPosts (postId, title, url, ticker, publishedAt, page, fetchedAt)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(post['id'], post['title'], post['url'], post['ticker'], post['published_at'], page, int(fetched_at))
+              for post in posts])
+        cursor.execute("""
+            DELETE FROM NewsPosts WHERE postId NOT IN (
+                SELECT postId FROM NewsPosts ORDER BY publishedAt DESC LIMIT ?
+            )
+        """, (MAX_CACHED_POSTS,))
+
+    try:
+        db.write(save).result()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+
+
+def load_cached_posts(limit=MAX_CACHED_POSTS):
+    """returns cached stories, newest first, in the same format as the api functions"""
+    try:
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT postId, title, url, ticker, publishedAt
+            FROM NewsPosts
+            ORDER BY publishedAt DESC
+            LIMIT ?
+        """, (limit,))
+        return [{'id': post_id, 'title': title, 'url': url, 'ticker': ticker, 'published_at': published_at}
+                for post_id, title, url, ticker, published_at in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+
+
+class NewsFeed:
+    """keeps track of which stories have been shown and which page comes next,
+    so stories that move between pages are only shown once"""
+    def __init__(self):
+        self.seen_ids = set()
+        self.next_page = 1
+        self.finished = False #no more pages to fetch
+
+    @staticmethod
+    def fetch_page(page):
+        """fetches and caches one page. blocking - call from a background task.
+        returns (page, stories, whether there is a next page). raises APIError if it can't be fetched"""
+        posts, has_next = get_news_page(page)
+        if posts:
+            save_posts(posts, page, time.time())
+        return page, posts, has_next
+
+    def cached_posts(self):
+        """returns stories cached from previous sessions, marking them as shown"""
+        return self.take_new(load_cached_posts())
+
+    def take_new(self, posts):
+        """returns only the stories not already shown, marking them as shown"""
+        new_posts = []
+        for post in posts:
+            if post['id'] not in self.seen_ids:
+                self.seen_ids.add(post['id'])
+                new_posts.append(post)
+        return new_posts
+
+    def page_loaded(self, page, has_next):
+        self.next_page = page + 1
+        self.finished = not has_next
+
+
+if __name__ == "__main__":
+    pass
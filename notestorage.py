@@ -0,0 +1,65 @@
+import difflib
+import hashlib
+import json
+import zlib
+
+COMPRESS_THRESHOLD = 4 * 1024 #bytes of text - notes at least this long are stored zlib compressed
+COMPRESS_LEVEL = 6
+SNAPSHOT_INTERVAL = 20 #revisions stored as deltas between full snapshots - the most a lookup has to apply
+
+
+def encode_content(text):
+    """the value stored in NotesData.content. long notes are stored as a compressed BLOB, the
+    rest as TEXT, so the type of a stored value says whether it needs decompressing"""
+    if text is None:
+        return None
+    data = text.encode("utf-8")
+    if len(data) < COMPRESS_THRESHOLD:
+        return text
+    compressed = zlib.compress(data, COMPRESS_LEVEL)
+    return compressed if len(compressed) < len(data) else text
+
+
+def decode_content(value):
+    """the note text of a stored NotesData.content value (TEXT, compressed BLOB or NULL)"""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def content_hash(text):
+    """a short digest of a note's text, to tell whether it has changed since it was saved"""
+    return hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).digest()
+
+
+#a delta is a list of ops that build a note's new text from its previous version, line by line.
+#[start, end] copies lines start to end of the previous version, a string is inserted as it is
+
+def make_delta(old_text, new_text):
+    """returns the delta from old_text to new_text, as json"""
+    old_lines = (old_text or "").splitlines(keepends=True)
+    new_lines = (new_text or "").splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([old_start, old_end])
+        elif tag in ("replace", "insert"):
+            ops.append("".join(new_lines[new_start:new_end]))
+    return json.dumps(ops, separators=(",", ":"))
+
+
+def apply_delta(old_text, delta):
+    """rebuilds the text a delta (from make_delta) was made from"""
+    old_lines = (old_text or "").splitlines(keepends=True)
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(old_lines[op[0]:op[1]])
+    return "".join(parts)
+
+
+if __name__ == "__main__":
+    pass
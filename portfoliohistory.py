@@ -0,0 +1,90 @@
+import time
+from collections import namedtuple
+import numpy as np
+from httpclient import APIError
+from pricehistory import price_history
+from sqlcode import get_ledger
+
+DAY = 24 * 60 * 60
+DEFAULT_DAYS = 365 #history shown when the user has no dated transactions
+MAX_PRICE_AGE = 7 * DAY #a stored price older than this isn't used to value a holding
+
+#timestamps: unix time of each point. value / invested: total value and net amount paid in at each point.
+#tickers: the coins, in the order of the rows of coin_values (value of each coin at each point, NaN
+#if it couldn't be priced). unpriced: tickers held in the range with no price history for some of it
+PortfolioHistory = namedtuple("PortfolioHistory", ["timestamps", "value", "invested", "tickers",
+                                                   "coin_values", "unpriced"])
+
+
+def cumulative_on_grid(grid, rows, times, amounts, row_count):
+    """running totals of amounts per row at each grid time - an amount counts from its time on.
+    every amount is added to the grid point it first counts at, then each row is summed along the
+    grid, so the cost doesn't depend on how many points each transaction is held for"""
+    totals = np.zeros((row_count, len(grid)))
+    columns = np.searchsorted(grid, times, side="left") #earlier than the grid -> column 0
+    inside = columns < len(grid)
+    np.add.at(totals, (rows[inside], columns[inside]), amounts[inside])
+    return np.cumsum(totals, axis=1)
+
+
+def prices_on_grid(grid, timestamps, prices, max_age=MAX_PRICE_AGE):
+    """the last price at or before each grid time, NaN where there isn't one within max_age"""
+    index = np.searchsorted(timestamps, grid, side="right") - 1
+    found = index >= 0
+    index = np.maximum(index, 0)
+    if len(timestamps):
+        found &= grid - timestamps[index] <= max_age
+    else:
+        found[:] = False
+    return np.where(found, prices[index] if len(prices) else np.nan, np.nan)
+
+
+def portfolio_history(username, start=None, end=None, step=DAY, coin_ids=None, store=price_history,
+                      top_up=False):
+    """values the user's portfolio at every step from start to end (unix seconds) from their
+    transactions and the stored price history. start defaults to the first dated transaction, end to now.
+    coin_ids maps tickers to coingecko ids where they differ from the coin's name in the database.
+    top_up fetches new price history first (blocking - call from a background task)"""
+    ledger = get_ledger(username)
+    end = int(time.time() if end is None else end)
+    if start is None:
+        dated = [executed_at for _, _, executed_at, _, _ in ledger if executed_at is not None]
+        start = min(dated) if dated else end - DEFAULT_DAYS * DAY
+    grid = np.arange(int(start), end + 1, step, dtype=np.int64)
+    if not len(grid) or not ledger:
+        return PortfolioHistory(grid, np.zeros(len(grid)), np.zeros(len(grid)), [], np.zeros((0, len(grid))), [])
+
+    tickers, rows = np.unique([ticker for ticker, _, _, _, _ in ledger], return_inverse=True)
+    tickers = tickers.tolist()
+    names = {ticker: name for ticker, name, _, _, _ in ledger}
+    coin_ids = coin_ids or {}
+    #transactions with no time are counted as made before the start of any history
+    times = np.array([executed_at or 0 for _, _, executed_at, _, _ in ledger], dtype=np.int64)
+    quantities = np.array([quantity or 0 for _, _, _, quantity, _ in ledger], dtype=np.float64)
+    values = np.array([value or 0 for _, _, _, _, value in ledger], dtype=np.float64)
+
+    holdings = cumulative_on_grid(grid, rows, times, quantities, len(tickers))
+    invested = cumulative_on_grid(grid, rows, times, values, len(tickers)).sum(axis=0)
+
+    prices = np.full(holdings.shape, np.nan)
+    for row, ticker in enumerate(tickers):
+        if not np.any(holdings[row]):
+            continue
+        coin_id = coin_ids.get(ticker) or names[ticker]
+        try:
+            if top_up:
+                store.top_up(coin_id)
+            series = store.query(coin_id, grid[0] - MAX_PRICE_AGE, grid[-1])
+        except (APIError, ValueError) as e:
+            print(f"No price history for {ticker}: {e}")
+            continue
+        prices[row] = prices_on_grid(grid, series.timestamp, series.price)
+
+    coin_values = holdings * prices
+    coin_values[holdings == 0] = 0 #a coin not held is worth nothing, priced or not
+    unpriced = [ticker for row, ticker in enumerate(tickers) if np.isnan(coin_values[row]).any()]
+    return PortfolioHistory(grid, np.nansum(coin_values, axis=0), invested, tickers, coin_values, unpriced)
+
+
+if __name__ == "__main__":
+    pass
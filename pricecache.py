@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    """cached price data for one coin. values is None if the api had no data for it"""
+    __slots__ = ("values", "fetched_at")
+
+    def __init__(self, values, fetched_at):
+        self.values = values
+        self.fetched_at = fetched_at #unix time it was fetched from the api
+
+    def age(self, now=None):
+        return (now or time.time()) - self.fetched_at
+
+
+class PriceCache:
+    """in memory, per coin price cache with a time to live and LRU eviction.
+    thread safe as it is used by background tasks"""
+    def __init__(self, ttl=60, max_entries=1000):
+        self.ttl = ttl #seconds an entry is fresh for
+        self.max_entries = max_entries
+        self.__entries = OrderedDict() #coin id -> CacheEntry, least recently used first
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, coin_ids, max_age=None):
+        """returns (fresh entries as {coin id: CacheEntry}, list of ids that need fetching)"""
+        max_age = self.ttl if max_age is None else max_age
+        now = time.time()
+        found = {}
+        missing = []
+        with self.__lock:
+            for coin_id in coin_ids:
+                entry = self.__entries.get(coin_id)
+                if entry is not None and entry.age(now) <= max_age:
+                    self.__entries.move_to_end(coin_id)
+                    found[coin_id] = entry
+                    self.hits += 1
+                elif coin_id not in missing:
+                    missing.append(coin_id)
+                    self.misses += 1
+        return found, missing
+
+    def get_entry(self, coin_id):
+        """returns the cached entry for a coin even if it is stale, or None"""
+        with self.__lock:
+            return self.__entries.get(coin_id)
+
+    def put_many(self, results, requested_ids=()):
+        """stores fetched results. requested ids the api returned nothing for are
+        cached as None so they aren't requested again until they expire"""
+        now = time.time()
+        with self.__lock:
+            for coin_id in requested_ids:
+                if coin_id not in results:
+                    self.__store(coin_id, CacheEntry(None, now))
+            for coin_id, values in results.items():
+                self.__store(coin_id, CacheEntry(values, now))
+
+    def __store(self, coin_id, entry):
+        self.__entries[coin_id] = entry
+        self.__entries.move_to_end(coin_id)
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False) #evicts least recently used
+
+    def invalidate(self, coin_ids=None):
+        """removes given coins (or everything) from the cache"""
+        with self.__lock:
+            if coin_ids is None:
+                self.__entries.clear()
+            else:
+                for coin_id in coin_ids:
+                    self.__entries.pop(coin_id, None)
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+if __name__ == "__main__":
+    pass
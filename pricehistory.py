@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from apifunctions import get_market_chart
+
+history_dir = "price_history"
+
+#one append only file of raw values per column, per coin (price_history/<coin id>/<column>.bin)
+COLUMNS = (("timestamp", np.int64), ("price", np.float64), ("volume", np.float64), ("market_cap", np.float64))
+INITIAL_DAYS = 365 #history fetched the first time a coin is topped up
+MIN_TOP_UP_INTERVAL = 5 * 60 #seconds - top ups sooner than this after the last point are skipped
+
+COIN_ID_PATTERN = re.compile(r"[a-z0-9][a-z0-9._-]*") #coingecko ids - never a path
+
+PriceSeries = namedtuple("PriceSeries", [name for name, dtype in COLUMNS])
+
+
+class PriceHistoryStore:
+    """columnar price history on disk. files are only ever appended to, and are memory mapped
+    to read them, so a range query binary searches the timestamps and only pages in the rows
+    it returns"""
+    def __init__(self, directory=history_dir):
+        self.directory = directory
+        self.__locks = {}
+        self.__locks_lock = threading.Lock()
+
+    def __lock(self, coin_id):
+        with self.__locks_lock:
+            return self.__locks.setdefault(coin_id, threading.Lock())
+
+    def __coin_dir(self, coin_id):
+        if not COIN_ID_PATTERN.fullmatch(coin_id):
+            raise ValueError(f"invalid coin id: {coin_id!r}")
+        return os.path.join(self.directory, coin_id)
+
+    def __path(self, coin_id, column):
+        return os.path.join(self.__coin_dir(coin_id), f"{column}.bin")
+
+    def length(self, coin_id):
+        """number of complete rows stored. an append cut short leaves some columns longer -
+        those extra values are ignored (and overwritten by the next append)"""
+        lengths = []
+        for name, dtype in COLUMNS:
+            try:
+                lengths.append(os.path.getsize(self.__path(coin_id, name)) // np.dtype(dtype).itemsize)
+            except FileNotFoundError:
+                return 0
+        return min(lengths)
+
+    def __map(self, coin_id, name, dtype, length):
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.__path(coin_id, name), dtype=dtype, mode="r", shape=(length,))
+
+    def last_timestamp(self, coin_id):
+        """unix time of the newest stored point, or None"""
+        length = self.length(coin_id)
+        if length == 0:
+            return None
+        return int(self.__map(coin_id, "timestamp", np.int64, length)[-1])
+
+    def append(self, coin_id, timestamps, prices, volumes, market_caps):
+        """appends rows newer than the last stored point. returns number of rows appended"""
+        columns = [np.asarray(column, dtype=dtype) for column, (name, dtype)
+                   in zip((timestamps, prices, volumes, market_caps), COLUMNS)]
+        with self.__lock(coin_id):
+            os.makedirs(self.__coin_dir(coin_id), exist_ok=True)
+            length = self.length(coin_id)
+            last = int(self.__map(coin_id, "timestamp", np.int64, length)[-1]) if length else None
+
+            order = np.argsort(columns[0], kind="stable")
+            columns = [column[order] for column in columns]
+            #keeps timestamps strictly increasing so range queries can binary search
+            keep = np.ones(len(columns[0]), dtype=bool)
+            keep[1:] = columns[0][1:] != columns[0][:-1]
+            if last is not None:
+                keep &= columns[0] > last
+            columns = [column[keep] for column in columns]
+            if not len(columns[0]):
+                return 0
+
+            for (name, dtype), column in zip(COLUMNS, columns):
+                with open(self.__path(coin_id, name), "r+b" if length else "wb") as file:
+                    file.seek(length * np.dtype(dtype).itemsize)
+                    file.truncate()
+                    file.write(column.tobytes())
+            return len(columns[0])
+
+    def query(self, coin_id, start=None, end=None):
+        """returns a PriceSeries of the points with start <= timestamp <= end (unix seconds).
+        the arrays are copies, so they stay valid after the store is written to"""
+        length = self.length(coin_id)
+        mapped = [self.__map(coin_id, name, dtype, length) for name, dtype in COLUMNS]
+        timestamps = mapped[0]
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        last = length if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        return PriceSeries(*(np.array(column[first:last]) for column in mapped))
+
+    def coins(self):
+        """ids of every coin with stored history"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if COIN_ID_PATTERN.fullmatch(name) and self.length(name))
+
+    def top_up(self, coin_id, min_interval=MIN_TOP_UP_INTERVAL):
+        """fetches only the points after the last stored one (or INITIAL_DAYS of history for a new coin)
+        and appends them. blocking - call from a background task. returns number of rows appended.
+        raises APIError if the history can't be fetched"""
+        last = self.last_timestamp(coin_id)
+        now = time.time()
+        if last is None:
+            columns = get_market_chart(coin_id, days=INITIAL_DAYS)
+        elif now - last < min_interval:
+            return 0
+        else:
+            columns = get_market_chart(coin_id, start=last + 1, end=now)
+        return self.append(coin_id, *columns)
+
+
+#shared by every page
+price_history = PriceHistoryStore()
+
+
+if __name__ == "__main__":
+    pass
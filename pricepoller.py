@@ -0,0 +1,116 @@
+from apifunctions import get_price_tracker_data, is_coingecko_throttled
+
+POLL_INTERVAL = 30 #seconds between polls while the window is focused
+UNFOCUSED_MULTIPLIER = 4 #polls this many times less often while the window isn't focused
+MAX_INTERVAL = 10 * 60 #longest gap between polls when backing off
+
+
+class PricePoller:
+    """polls prices for every coin the subscribed pages show, and pushes only the rows that
+    changed to each page. stops polling while no page on screen needs prices.
+    all methods run on the tk main thread - fetching is done through the app's TaskRunner"""
+    class Subscription:
+        def __init__(self, coins, callback):
+            self.coins = set(coins)
+            self.callback = callback #called with {coin id: values} of changed coins
+
+    def __init__(self, root, tasks, interval=POLL_INTERVAL):
+        self.root = root
+        self.tasks = tasks
+        self.interval = interval
+        self.__subscriptions = {} #page -> Subscription
+        self.__latest = {} #coin id -> last values pushed
+        self.__after_id = None
+        self.__backoff = 1 #doubles each time a poll is throttled or fails
+        self.focused = True
+        root.bind("<FocusIn>", lambda event: self.__set_focused(True), add="+")
+        root.bind("<FocusOut>", lambda event: self.__set_focused(False), add="+")
+
+    def __set_focused(self, focused):
+        self.focused = focused
+        if focused:
+            self.wake()
+
+    def subscribe(self, page, coins, callback):
+        """starts pushing changes for coins to page. coins can be changed later with set_coins"""
+        self.__subscriptions[page] = self.Subscription(coins, callback)
+        self.wake()
+
+    def set_coins(self, page, coins):
+        subscription = self.__subscriptions.get(page)
+        if subscription:
+            subscription.coins = set(coins)
+            self.wake()
+
+    def unsubscribe(self, page):
+        self.__subscriptions.pop(page, None)
+
+    def record(self, data):
+        """stores prices a page fetched itself, so the next poll only pushes real changes"""
+        self.__latest.update({coin_id: values for coin_id, values in data.items() if values})
+
+    def active_coins(self):
+        """union of the coins of every subscribed page that is currently on screen"""
+        coins = set()
+        for page, subscription in self.__subscriptions.items():
+            if self.root.is_current_page(page):
+                coins |= subscription.coins
+        return coins
+
+    def current_interval(self):
+        """seconds until the next poll - longer while unfocused or being throttled"""
+        interval = self.interval * self.__backoff
+        if not self.focused:
+            interval *= UNFOCUSED_MULTIPLIER
+        return min(interval, MAX_INTERVAL)
+
+    def wake(self):
+        """(re)starts polling if a page on screen needs prices and it isn't already scheduled"""
+        if self.__after_id is None and self.active_coins():
+            self.__schedule()
+
+    def __schedule(self):
+        self.__after_id = self.root.after(int(self.current_interval() * 1000), self.poll)
+
+    def poll(self):
+        self.__after_id = None
+        coins = self.active_coins()
+        if not coins:
+            return #paused until wake() is called
+        if is_coingecko_throttled():
+            self.__backoff = min(self.__backoff * 2, MAX_INTERVAL // self.interval)
+        elif not self.tasks.is_busy(self):
+            #prices newer than half an interval (e.g. from a page's own refresh) aren't fetched again
+            self.tasks.submit(self, get_price_tracker_data, sorted(coins), self.interval / 2,
+                              on_success=self.on_prices, on_error=self.on_poll_error)
+        self.__schedule()
+
+    def on_prices(self, data):
+        if data and not any(data.values()): #nothing could be fetched
+            self.on_poll_error(None)
+            return
+        self.__backoff = 1
+        changed = {coin_id: values for coin_id, values in data.items()
+                   if values and self.__latest.get(coin_id) != values}
+        self.__latest.update(changed)
+        if not changed:
+            return
+        for page, subscription in list(self.__subscriptions.items()):
+            page_changes = {coin_id: changed[coin_id] for coin_id in subscription.coins & changed.keys()}
+            if page_changes:
+                subscription.callback(page_changes)
+
+    def on_poll_error(self, error):
+        self.__backoff = min(self.__backoff * 2, MAX_INTERVAL // self.interval)
+        if error is not None:
+            print(f"Price poll failed: {error}")
+
+    def stop(self):
+        if self.__after_id is not None:
+            self.root.after_cancel(self.__after_id)
+            self.__after_id = None
+        self.tasks.cancel(self)
+
+
+if __name__ == "__main__":
+    pass
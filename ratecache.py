@@ -0,0 +1,86 @@
+import threading
+import time
+from apifunctions import get_exchange_rates
+from httpclient import APIError
+from sqlcode import save_exchange_rates, load_exchange_rates
+
+REFRESH_INTERVAL = 60 * 60 #seconds before the stored rates are refreshed (and shown as stale)
+
+
+class RateMatrix:
+    """every exchange rate against one base currency - any cross rate can be worked out from it"""
+    def __init__(self, base_currency, rates, fetched_at):
+        self.base_currency = base_currency
+        self.rates = dict(rates)
+        self.rates[base_currency] = 1.0
+        self.fetched_at = fetched_at
+
+    def cross_rate(self, original_currency, new_currency):
+        """how much 1 original_currency is worth in new_currency, or None if either is unknown"""
+        if original_currency not in self.rates or new_currency not in self.rates:
+            return None
+        return self.rates[new_currency] / self.rates[original_currency]
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+
+class ExchangeRateCache:
+    """keeps one rate matrix in memory and in the database, so every currency pair
+    is available without a request and the converter still works offline"""
+    def __init__(self, base_currency="USD", refresh_interval=REFRESH_INTERVAL):
+        self.base_currency = base_currency
+        self.refresh_interval = refresh_interval
+        self.__matrix = None
+        self.__loaded = False
+        self.__lock = threading.Lock() #stops two threads refreshing at once
+
+    @property
+    def matrix(self):
+        return self.__matrix
+
+    def is_stale(self):
+        return self.__matrix is None or self.__matrix.age() > self.refresh_interval
+
+    def load(self):
+        """loads stored rates (first call only), refreshing them if they are missing or stale.
+        blocking - call from a background task. returns the matrix (None if there are no rates at all)"""
+        with self.__lock:
+            if not self.__loaded:
+                stored = load_exchange_rates()
+                if stored:
+                    self.__matrix = RateMatrix(*stored)
+                self.__loaded = True
+        if self.is_stale():
+            self.refresh()
+        return self.__matrix
+
+    def refresh(self):
+        """fetches a new rate matrix in a single request. keeps the old one if that fails.
+        blocking - call from a background task"""
+        with self.__lock:
+            try:
+                rates = get_exchange_rates(self.base_currency)
+            except APIError as e:
+                print(f"Unable to refresh exchange rates: {e}")
+                rates = None
+            if rates:
+                fetched_at = time.time()
+                self.__matrix = RateMatrix(self.base_currency, rates, fetched_at)
+                save_exchange_rates(self.base_currency, rates, fetched_at)
+        return self.__matrix
+
+    def get_rate(self, original_currency, new_currency):
+        """returns cross rate from the matrix in memory (no request), or None"""
+        matrix = self.__matrix
+        if matrix is None:
+            return None
+        return matrix.cross_rate(original_currency, new_currency)
+
+
+#shared by every converter page
+rate_cache = ExchangeRateCache()
+
+
+if __name__ == "__main__":
+    pass
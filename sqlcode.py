@@ -1,155 +1,126 @@
+import re
 import sqlite3
+import time
+import zlib
 from mathfunctions import hash_password
-from apifunctions import get_coin_ticker_with_key
-
-db_path = "CryptoApp.db"
+from coincatalog import get_coin_ticker
+from database import db
+from notestorage import encode_content, decode_content, content_hash, make_delta, apply_delta, SNAPSHOT_INTERVAL
 
 def add_new_user(username, password):
     """adds new user to database"""
     hashed_password = hash_password(password)
-    
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-    
+
     query = "INSERT INTO User (username, hashedPassword) VALUES (?, ?)"
     try:
-        cursor.execute(query, (username, hashed_password))
-        connection.commit()
+        db.write(lambda cursor: cursor.execute(query, (username, hashed_password))).result()
         return True
     except sqlite3.IntegrityError:
         return False
     except sqlite3.Error as e:
         return False
-    finally:
-        connection.close()
 
 
 def check_username_exists(username):
     "returns boolean"
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-    
+    cursor = db.cursor()
+
     query = "SELECT username FROM User WHERE username = ?;"
     cursor.execute(query, (username,))
     result = cursor.fetchone()
-    connection.close()
     if result:
         return True
     else:
         return False
-    
+
 
 def add_coin_to_list(username, coinName):
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-    
-    #checks to see if its a valid coin
-    coinTicker = get_coin_ticker_with_key(coinName)
-    if coinTicker:
-        db_query = "SELECT coinName from Coin WHERE coinName = ?;"
-        cursor.execute(db_query, (coinName,))
+    #checks to see if its a valid coin (before the transaction, as it may need an api call)
+    coinTicker = get_coin_ticker(coinName)
+    if not coinTicker:
+        return False
+
+    def add_to_list(cursor):
+        db_query = "SELECT coinName from Coin WHERE coinTicker = ?;"
+        cursor.execute(db_query, (coinTicker,))
         result = cursor.fetchone()
         #checks if coin in coin table, if not it adds it
         if not result:
-            coin_info = coinName
-            if coin_info:
-                add_coin_to_database(coinTicker, coinName)
-    
+            add_coin_to_database(coinTicker, coinName)
+
         query = "INSERT INTO TopcoinList (listOwner, coinTicker) VALUES (?,?);"
-        try:
-            cursor.execute(query, (username, coinTicker,))
-        except sqlite3.IntegrityError:
-            return False
-        else:
-            return True
-        finally:
-            connection.commit()
-            connection.close()
-    else:
-        connection.close()
+        cursor.execute(query, (username, coinTicker,))
+
+    try:
+        #one write - the coin and the list entry are added together or not at all
+        db.write(add_to_list).result()
+        return True
+    except sqlite3.IntegrityError:
         return False
 
 
 def add_coin_to_database(coinTicker, coinName):
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-
     query = "INSERT INTO Coin (coinTicker, coinName) VALUES (?,?);"
-    cursor.execute(query, (coinTicker, coinName,))
-    connection.commit()
-    connection.close()
+    db.write(lambda cursor: cursor.execute(query, (coinTicker, coinName,))).result()
 
 
 def remove_coin_from_list(username, coinTicker):
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
     coinTicker = coinTicker.upper()
     if coinTicker:
         #removes coin from user's list
         query = "DELETE FROM TopcoinList WHERE listOwner = ? AND coinTicker = ?;"
-        try:
+        def remove(cursor):
             cursor.execute(query, (username, coinTicker,))
-            if cursor.rowcount > 0:
-                connection.commit()
-                return True
-            else:
-                return False  #coin was not in user's list
+            return cursor.rowcount > 0 #False if coin was not in user's list
+
+        try:
+            return db.write(remove).result()
         except sqlite3.Error as e:
             print(f"An error occurred: {e}")
             return False
-        finally:
-            connection.close()
     else:
-        connection.close()
         return False  #invalid coin name
 
 
-def add_transaction_to_db(username, coin_ticker, value, quantity):
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-    
-    query = "INSERT INTO Transactions (portfolioOwner, coinTicker, value, quantity) VALUES (?, ?, ?, ?);"
+def add_transaction_to_db(username, coin_ticker, value, quantity, executed_at=None):
+    """executed_at is the unix time of the transaction - now if not given"""
+    query = "INSERT INTO Transactions (portfolioOwner, coinTicker, value, quantity, executedAt) VALUES (?, ?, ?, ?, ?);"
+    executed_at = int(time.time() if executed_at is None else executed_at)
     try:
-        cursor.execute(query, (username, coin_ticker, value, quantity))
-        connection.commit()
+        db.write(lambda cursor: cursor.execute(query, (username, coin_ticker, value, quantity, executed_at))).result()
         return True
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
         return False
-    finally:
-        connection.close()
 
 def check_ticker_exists(ticker):
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-        
+    cursor = db.cursor()
+
     query = "SELECT coinTicker FROM Coin WHERE coinTicker = ?;"
     cursor.execute(query, (ticker,))
     result = cursor.fetchone()
-        
-    connection.close()
+
     return result is not None
 
 if __name__ == "__main__":
     pass
 
 def fetch_transactions(username):
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-    
+    """returns {ticker: {'total_value', 'quantity'}} totals of the user's transactions.
+    read from Positions (kept up to date by triggers), so it costs one row per coin held"""
     query = """
     SELECT coinTicker,
-           SUM(value) as total_value,
-           SUM(quantity) as total_quantity
-    FROM Transactions
-    WHERE portfolioOwner = ?
-    GROUP BY coinTicker
+           totalValue as total_value,
+           quantity as total_quantity
+    FROM Positions
+    WHERE positionOwner = ?
     """
-    
+
     try:
+        cursor = db.cursor()
         cursor.execute(query, (username,))
         results = cursor.fetchall()
-        
+
         transactions = {}
         for row in results:
             coin, total_value, total_quantity = row
@@ -157,125 +128,293 @@ def fetch_transactions(username):
                 'total_value': total_value,
                 'quantity': total_quantity
             }
-        
+
         return transactions
-    
+
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return {}
-    finally:
-        connection.close()
 
 
+def get_ledger(username):
+    """returns [(ticker, coin name, executedAt, quantity, value)] of every transaction the user made,
+    in no particular order. executedAt is None for transactions made before times were recorded"""
+    query = """
+    SELECT Transactions.coinTicker, Coin.coinName, executedAt, quantity, value FROM Transactions
+    INNER JOIN Coin ON Coin.coinTicker = Transactions.coinTicker WHERE portfolioOwner = ?
+    """
+    try:
+        cursor = db.cursor()
+        cursor.execute(query, (username,))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+
+
+def get_position(username, coin_ticker):
+    """returns {'total_value', 'quantity'} of one coin the user holds, or None if they have no transactions for it"""
+    query = "SELECT totalValue, quantity FROM Positions WHERE positionOwner = ? AND coinTicker = ?;"
+    try:
+        cursor = db.cursor()
+        cursor.execute(query, (username, coin_ticker))
+        result = cursor.fetchone()
+        return {'total_value': result[0], 'quantity': result[1]} if result else None
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+
+def stored_size(value):
+    return len(value) if isinstance(value, bytes) else len((value or "").encode("utf-8"))
+
+def add_note_revision(cursor, note_id, old_content, content):
+    """stores content as a note's next revision - as a delta against old_content (the previous
+    revision), or as a full snapshot every SNAPSHOT_INTERVAL revisions or when a delta wouldn't be
+    smaller. baseRevision is the snapshot a revision's delta chain starts from. call inside a write"""
+    cursor.execute("""
+        SELECT revision, baseRevision FROM NoteRevisions WHERE noteId=? ORDER BY revision DESC LIMIT 1
+    """, (note_id,))
+    latest = cursor.fetchone()
+    revision = latest[0] + 1 if latest else 1
+    data, base_revision = encode_content(content), revision
+    if latest and revision - latest[1] < SNAPSHOT_INTERVAL:
+        delta = encode_content(make_delta(old_content, content))
+        if stored_size(delta) < stored_size(data):
+            data, base_revision = delta, latest[1]
+    cursor.execute("""
+        INSERT INTO NoteRevisions (noteId, revision, savedAt, baseRevision, data) VALUES (?, ?, ?, ?, ?)
+    """, (note_id, revision, time.time(), base_revision, data))
+
+def index_note_text(cursor, note_id, content, stored):
+    """the search index's triggers can't decompress a note, so the text of one stored compressed
+    is written to the index here. call after writing the note's content, inside the same write"""
+    if isinstance(stored, bytes):
+        cursor.execute("UPDATE NotesSearch SET content=? WHERE rowid=?", (content, note_id))
+
+def write_note_content(cursor, username, note_id, content, title=None):
+    """updates a note's content (and title, if given) and records the new revision. the content
+    isn't rewritten if it hasn't changed, so an unchanged save costs no index, search or history
+    updates. a note stored before compression is rewritten compressed, but as its text is the
+    same that isn't a new revision. returns False if the user has no such note. call inside a write"""
+    cursor.execute("SELECT title, content FROM NotesData WHERE noteId=? AND noteOwner=?", (note_id, username))
+    row = cursor.fetchone()
+    if row is None:
+        return False
+    old_title, old_stored = row
+    stored = encode_content(content)
+    if stored != old_stored:
+        old_content = decode_content(old_stored)
+        cursor.execute("UPDATE NotesData SET content=? WHERE noteId=?", (stored, note_id))
+        index_note_text(cursor, note_id, content, stored)
+        if content_hash(content) != content_hash(old_content):
+            add_note_revision(cursor, note_id, old_content, content)
+    if title is not None and title != old_title:
+        cursor.execute("UPDATE NotesData SET title=? WHERE noteId=?", (title, note_id))
+    return True
+
 def save_note_to_db(username, title, content, note_id=None):
     """Save or update a note in the database"""
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-    try:
+    def save(cursor):
         if note_id:
             # Update existing note
-            cursor.execute("""
-                UPDATE NotesData 
-                SET title=?, content=? 
-                WHERE noteId=? AND noteOwner=?
-            """, (title, content, note_id, username))
+            write_note_content(cursor, username, note_id, content, title)
+            return note_id
         else:
             # Create new note
+            stored = encode_content(content)
             cursor.execute("""
-                INSERT INTO NotesData (title, content, noteOwner) 
+                INSERT INTO NotesData (title, content, noteOwner)
                 VALUES (?, ?, ?)
-            """, (title, content, username))
-            note_id = cursor.lastrowid
-        
-        connection.commit()
-        return note_id
+            """, (title, stored, username))
+            new_id = cursor.lastrowid
+            index_note_text(cursor, new_id, content, stored)
+            add_note_revision(cursor, new_id, None, content)
+            return new_id
+
+    try:
+        return db.write(save).result()
+    except (sqlite3.Error, zlib.error) as e:
+        print(f"Database error: {e}")
+        return None
+
+def save_note_content(username, note_id, content):
+    """saves only a note's content (used by autosave)"""
+    try:
+        return db.write(write_note_content, username, note_id, content).result()
+    except (sqlite3.Error, zlib.error) as e:
+        print(f"Database error: {e}")
+        return False
+
+def rebuild_revision(cursor, note_id, revision, base_revision):
+    """the text of a revision - its snapshot with each delta after it applied in turn"""
+    cursor.execute("""
+        SELECT data FROM NoteRevisions WHERE noteId=? AND revision BETWEEN ? AND ? ORDER BY revision
+    """, (note_id, base_revision, revision))
+    rows = cursor.fetchall()
+    text = decode_content(rows[0][0])
+    for (delta,) in rows[1:]:
+        text = apply_delta(text, decode_content(delta))
+    return text or ""
+
+def get_note_revisions(username, note_id):
+    """returns [(revision, savedAt)] of a note's saved versions, newest first"""
+    try:
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT revision, savedAt FROM NoteRevisions
+            WHERE noteId=? AND noteId IN (SELECT noteId FROM NotesData WHERE noteOwner=?)
+            ORDER BY revision DESC
+        """, (note_id, username))
+        return cursor.fetchall()
     except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+
+def get_note_at(username, note_id, timestamp):
+    """returns a note's content as it was saved at unix time timestamp, or None if it had
+    no saved content yet. at most SNAPSHOT_INTERVAL deltas are applied"""
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT 1 FROM NotesData WHERE noteId=? AND noteOwner=?", (note_id, username))
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute("""
+            SELECT revision, baseRevision FROM NoteRevisions WHERE noteId = ? AND savedAt <= ?
+            ORDER BY savedAt DESC, revision DESC LIMIT 1
+        """, (note_id, timestamp))
+        row = cursor.fetchone()
+        return rebuild_revision(cursor, note_id, *row) if row else None
+    except (sqlite3.Error, zlib.error, ValueError) as e:
         print(f"Database error: {e}")
         return None
-    finally:
-        connection.close()
 
 def delete_note_from_db(note_id):
     """Delete a note from the database"""
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
     try:
-        cursor.execute("DELETE FROM NotesData WHERE noteId=?", (note_id,))
-        connection.commit()
+        db.write(lambda cursor: cursor.execute("DELETE FROM NotesData WHERE noteId=?", (note_id,))).result()
         return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return False
-    finally:
-        connection.close()
 
 def update_note_title_in_db(note_id, new_title):
     """Update the title of a note"""
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
+    query = """
+        UPDATE NotesData
+        SET title=?
+        WHERE noteId=?
+    """
     try:
-        cursor.execute("""
-            UPDATE NotesData 
-            SET title=? 
-            WHERE noteId=?
-        """, (new_title, note_id))
-        connection.commit()
+        db.write(lambda cursor: cursor.execute(query, (new_title, note_id))).result()
         return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return False
-    finally:
-        connection.close()
 
 def get_note_content(note_id):
     """Get content for a specific note by ID"""
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
     try:
+        cursor = db.cursor()
         cursor.execute("""
-            SELECT content 
-            FROM NotesData 
+            SELECT content
+            FROM NotesData
             WHERE noteId=?
         """, (note_id,))
         result = cursor.fetchone()
-        return result[0] if result else ""
-    except sqlite3.Error as e:
+        return decode_content(result[0]) if result else ""
+    except (sqlite3.Error, zlib.error) as e:
         print(f"Database error: {e}")
         return ""
-    finally:
-        connection.close()
 
 def get_notes_list(username):
     """Get list of notes with their IDs"""
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
     try:
+        cursor = db.cursor()
         cursor.execute("""
-            SELECT noteId, title 
-            FROM NotesData 
-            WHERE noteOwner=? 
+            SELECT noteId, title
+            FROM NotesData
+            WHERE noteOwner=?
             ORDER BY noteId
         """, (username,))
         return cursor.fetchall()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
-    finally:
-        connection.close()
+
+def build_search_query(text):
+    """turns what the user typed into an fts5 query - every word must match, and the last one
+    may be a prefix (it's still being typed). words are quoted so fts syntax in them is literal.
+    returns None if there are no words"""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if not text[-1].isspace():
+        terms[-1] += "*"
+    return " ".join(terms)
+
+def search_notes(username, text, limit=50):
+    """returns [(noteId, title, snippet)] of the user's notes matching text, best match first.
+    titles count more than contents. matched words are marked with [ ] in the snippet"""
+    query = build_search_query(text)
+    if query is None:
+        return []
+    try:
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT NotesSearch.rowid, NotesData.title,
+                   snippet(NotesSearch, 1, '[', ']', '...', 12)
+            FROM NotesSearch
+            INNER JOIN NotesData ON NotesData.noteId = NotesSearch.rowid
+            WHERE NotesSearch MATCH ? AND NotesData.noteOwner = ?
+            ORDER BY bm25(NotesSearch, 5.0, 1.0)
+            LIMIT ?
+        """, (query, username, limit))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
 
 def get_coin_name_from_ticker(ticker):
     """Gets the coin name from its ticker using the database"""
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-    
     query = "SELECT coinName FROM Coin WHERE coinTicker = ?;"
     try:
+        cursor = db.cursor()
         cursor.execute(query, (ticker.upper(),))  #convert to uppercase to match DB
         result = cursor.fetchone()
         return result[0] if result else None
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
-    finally:
-        connection.close()
 
+
+def save_exchange_rates(base_currency, rates, fetched_at):
+    """replaces the stored exchange rate matrix"""
+    def replace(cursor):
+        cursor.execute("DELETE FROM ExchangeRates")
+        cursor.executemany("""
+            INSERT INTO ExchangeRates (currency, rate, baseCurrency, fetchedAt)
+            VALUES (?, ?, ?, ?)
+        """, [(currency, rate, base_currency, int(fetched_at)) for currency, rate in rates.items()])
+
+    try:
+        db.write(replace).result()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+
+def load_exchange_rates():
+    """returns stored (base currency, {currency: rate}, fetched at) or None if there are none"""
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT currency, rate, baseCurrency, fetchedAt FROM ExchangeRates")
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+        rates = {currency: rate for currency, rate, _, _ in rows}
+        return rows[0][2], rates, rows[0][3]
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
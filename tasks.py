@@ -0,0 +1,112 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Task:
+    """a single piece of background work submitted by a page"""
+    def __init__(self, owner, on_success=None, on_error=None, indicator=None):
+        self.owner = owner
+        self.on_success = on_success
+        self.on_error = on_error
+        self.indicator = indicator
+        self.future = None
+        self.__cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.__cancelled.is_set()
+
+    def cancel(self):
+        """marks task as cancelled - its callbacks will never run"""
+        self.__cancelled.set()
+        if self.future:
+            self.future.cancel() #only stops it if it hasn't started yet
+
+
+class TaskRunner:
+    """runs blocking work (network calls, password hashing) on worker threads
+    and hands the results back to the tk main loop through a queue drained by after()"""
+    def __init__(self, root, max_workers=4, poll_interval=50):
+        self.root = root
+        self.poll_interval = poll_interval #ms between queue checks
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="TaskRunner")
+        self.__results = queue.Queue()
+        self.__tasks = {} #owner -> set of tasks still running
+        self.__after_id = self.root.after(self.poll_interval, self.process_results)
+
+    def submit(self, owner, func, *args, on_success=None, on_error=None, indicator=None, **kwargs):
+        """runs func(*args, **kwargs) on a worker thread. Callbacks are called on the main thread.
+        func must NOT touch any tk widgets"""
+        task = Task(owner, on_success, on_error, indicator)
+        self.__tasks.setdefault(owner, set()).add(task)
+        if indicator:
+            indicator.start()
+        task.future = self.__executor.submit(self.__run, task, func, args, kwargs)
+        return task
+
+    def __run(self, task, func, args, kwargs):
+        """worker thread side - only ever puts results onto the queue"""
+        if task.cancelled:
+            return
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.__results.put((task, None, e))
+        else:
+            self.__results.put((task, result, None))
+
+    def cancel(self, owner):
+        """cancels every task submitted by owner (used when a page is removed from the stack)"""
+        for task in self.__tasks.pop(owner, set()):
+            task.cancel()
+            if task.indicator:
+                task.indicator.stop()
+
+    def is_busy(self, owner):
+        return bool(self.__tasks.get(owner))
+
+    def process_results(self):
+        """main thread side - runs callbacks for finished tasks"""
+        while True:
+            try:
+                task, result, error = self.__results.get_nowait()
+            except queue.Empty:
+                break
+
+            if task.cancelled:
+                continue
+            owner_tasks = self.__tasks.get(task.owner)
+            if owner_tasks is not None:
+                owner_tasks.discard(task)
+                if not owner_tasks:
+                    del self.__tasks[task.owner]
+            if task.indicator:
+                task.indicator.stop()
+
+            try:
+                if error is not None:
+                    if task.on_error:
+                        task.on_error(error)
+                    else:
+                        print(f"Background task error: {error}")
+                elif task.on_success:
+                    task.on_success(result)
+            except Exception as e: #a bad callback shouldn't stop the queue being drained
+                print(f"Error in task callback: {e}")
+
+        self.__after_id = self.root.after(self.poll_interval, self.process_results)
+
+    def shutdown(self):
+        """cancels everything and stops the worker threads"""
+        for owner in list(self.__tasks):
+            self.cancel(owner)
+        try:
+            self.root.after_cancel(self.__after_id)
+        except Exception:
+            pass
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from apifunctions import get_with_key
+from httpcache import ResponseCache
+from httpclient import APIClient
+from keypool import KeyPool
+
+API_KEY = "SECRETKEY"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = b'{"coins": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stored_response_has_no_api_key(server, tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    client = APIClient("test", server, key_params=("k",), cache=cache, cache_policy={"/search": 60})
+
+    response = client.get("/search", {"query": "btc", "k": API_KEY})
+    assert response.status_code == 200
+    cache.close() #waits for the queued insert
+    client.close()
+
+    rows = sqlite3.connect(path).execute("SELECT * FROM Responses").fetchall()
+    assert len(rows) == 1
+    for value in rows[0]:
+        if isinstance(value, bytes):
+            value = zlib.decompress(value)
+        assert API_KEY.encode() not in (value if isinstance(value, bytes) else str(value).encode())
+    assert "query=btc" in rows[0][1]
+
+
+def test_cache_hit_url_has_no_api_key(server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    client = APIClient("test", server, key_params=("k",), cache=cache, cache_policy={"/search": 60})
+    client.get("/search", {"query": "btc", "k": API_KEY})
+    cache.close()
+
+    response = client.get("/search", {"query": "btc", "k": API_KEY})
+    assert response.from_cache
+    assert API_KEY not in response.url
+    cache.close()
+    client.close()
+
+
+def test_revalidation_is_reported_to_the_key_pool(server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    #/search is always revalidated, /list is fresh for a minute
+    client = APIClient("test", server, key_params=("k",), cache=cache, cache_policy={"/search": 0, "/list": 60})
+    pool = KeyPool("keys.txt", lambda path: [API_KEY])
+    assert list(pool.keys_to_try()) == [API_KEY] #loads the keys, as the api functions do
+
+    get_with_key(client, pool, API_KEY, "/search", {"query": "btc", "k": API_KEY})
+    get_with_key(client, pool, API_KEY, "/list", {"k": API_KEY})
+    cache.close()
+
+    revalidated = get_with_key(client, pool, API_KEY, "/search", {"query": "btc", "k": API_KEY})
+    hit = get_with_key(client, pool, API_KEY, "/list", {"k": API_KEY})
+    assert revalidated.from_cache and revalidated.revalidated
+    assert hit.from_cache and not hit.revalidated
+    assert cache.stats() == {"hits": 1, "revalidated": 1, "misses": 2}
+    assert pool.stats()[0]["requests"] == 3 #two downloads and the revalidation, not the hit
+    cache.close()
+    client.close()
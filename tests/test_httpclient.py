@@ -0,0 +1,52 @@
+import threading
+import time
+import pytest
+import requests
+from httpclient import APIClient, CircuitBreaker
+
+
+def test_coalesce_shares_only_between_calls_from_the_same_function():
+    client = APIClient("test", "http://127.0.0.1")
+
+    def get_posts():
+        def fetch():
+            time.sleep(0.2)
+            return ["post"]
+        return client.coalesce("/posts/", [("page", "1")], fetch)
+
+    def get_page():
+        def fetch():
+            time.sleep(0.2)
+            return ["story"], False
+        return client.coalesce("/posts/", [("page", "1")], fetch)
+
+    results = {}
+    threads = [threading.Thread(target=lambda index=index, func=func: results.update({index: func()}))
+               for index, func in enumerate((get_posts, get_page, get_page))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {0: ["post"], 1: (["story"], False), 2: (["story"], False)}
+    assert client.flights.coalesced == 1
+    client.close()
+
+
+def test_unexpected_error_finishes_the_half_open_probe():
+    client = APIClient("test", "http://127.0.0.1", max_retries=0)
+    client.circuit_breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    client.circuit_breaker.record_failure() #open - the next request is the probe
+
+    def broken_get(*args, **kwargs):
+        raise ValueError("not a RequestException")
+    client.session.get = broken_get
+    with pytest.raises(ValueError):
+        client.get("/ping")
+
+    ok = requests.Response()
+    ok.status_code = 200
+    client.session.get = lambda *args, **kwargs: ok
+    assert client.get("/ping") is ok #a new probe is let through
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+    client.close()
@@ -0,0 +1,13 @@
+from database import ConnectionManager
+from migrations import migrate, check_query_plans, LATEST_VERSION, get_version
+
+
+def test_hot_queries_use_their_indexes(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    try:
+        assert migrate(manager) == list(range(1, LATEST_VERSION + 1))
+        assert get_version(manager.cursor()) == LATEST_VERSION
+        assert migrate(manager) == []
+        assert check_query_plans(manager) == []
+    finally:
+        manager.close_all()
@@ -1,30 +1,37 @@
-import hashlib
 import sqlite3
-
-db_path = "CryptoApp.db"
+from database import db
+from mathfunctions import hash_password, check_password, needs_rehash
 
 
 def verify_password(provided_password, username):
-    """verifies to see if stored (hashed) password is the same as the hashed new password for the user given"""
+    """verifies the password of the user given, with one lookup of their stored hash. if it is right
+    but was hashed with old settings, it is hashed again with the current ones. slow on purpose
+    (the key derivation function runs once or twice) - call from a worker thread"""
     stored_password = get_hashed_password(username)
-    salt = bytes.fromhex(stored_password[:64]) #extracts salt from stored password (first 64 chars / 32 bytes)
-    stored_hash = bytes.fromhex(stored_password[64:]) #extracts stored hash (after 64 chars)
-    
-    iterations = 100_000 #same parameters used in hash_password
-    key_length = 32
-    
-    #hashes provided password with the extracted salt
-    new_hash = hashlib.pbkdf2_hmac('sha256', provided_password.encode(), salt, iterations, key_length)
-    #compares new hash with stored hash
-    return new_hash == stored_hash
+    if stored_password is None:
+        hash_password(provided_password) #so a missing user takes as long as a wrong password
+        return False
+    if not check_password(provided_password, stored_password):
+        return False
+    if needs_rehash(stored_password):
+        update_hashed_password(username, stored_password, hash_password(provided_password))
+    return True
+
+def update_hashed_password(username, old_hash, new_hash):
+    """replaces a user's stored hash - only if it is still old_hash"""
+    query = "UPDATE User SET hashedPassword = ? WHERE username = ? AND hashedPassword = ?;"
+    try:
+        db.write(lambda cursor: cursor.execute(query, (new_hash, username, old_hash))).result()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
 
 def get_hashed_password(username):
     """returns the hashes password of a user"""
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-    
     query = "SELECT hashedPassword FROM User WHERE username = ?;"
     try:
+        cursor = db.cursor()
         cursor.execute(query, (username,))
         result = cursor.fetchone()
         if result:
@@ -34,17 +41,13 @@ def get_hashed_password(username):
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
-    finally:
-        connection.close()
 
 
 def get_top_coins(username):
     """returns the list of top coins"""
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
-
     query = "SELECT Coin.coinName FROM Coin INNER JOIN TopcoinList ON Coin.coinTicker = TopcoinList.coinTicker WHERE listOwner = ?;"
     try:
+        cursor = db.cursor()
         cursor.execute(query, (username,))
         result = cursor.fetchall()
         formatted_result = [item[0] for item in result]
@@ -54,6 +57,4 @@ def get_top_coins(username):
             return []
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-        return []
-    finally:
-        connection.close()
\ No newline at end of file
+        return []
\ No newline at end of file